@@ -1,7 +1,7 @@
 import numpy as np
 from scipy import signal
 from sklearn.metrics.cluster import contingency_matrix
-from numba import jit
+from numba import jit, njit, prange
 
 
 def FSS(pred, gt, threshold=8., n=8):
@@ -84,3 +84,111 @@ def HeidkeSkillScore(pred, gt, threshold):
     
     HSS = 2*(a*d - b*c)/((a+c)*(c+d)*(a+b)*(b+d))
     return HSS
+
+
+@njit(parallel=True)
+def _crps_ensemble_kernel(ens, obs):
+    m = ens.shape[1]
+    crps = np.full(obs.shape[0], np.nan)
+    for k in prange(obs.shape[0]):
+        if not np.isfinite(obs[k]) or not np.all(np.isfinite(ens[k])):
+            continue
+        x = np.sort(ens[k])
+        abs_error = 0.0
+        spread = 0.0
+        for i in range(m):
+            abs_error += abs(x[i] - obs[k])
+            spread += (2 * (i + 1) - m - 1) * x[i]
+        crps[k] = abs_error / m - spread / (m * m)
+    return crps
+
+
+def _crps_ensemble_points(ens, obs):
+    ens = np.ascontiguousarray(np.reshape(ens, (ens.shape[0], -1)).T, dtype=np.float64)
+    obs = np.ascontiguousarray(np.ravel(obs), dtype=np.float64)
+    return _crps_ensemble_kernel(ens, obs)
+
+
+def crps_ensemble(ens, obs):
+    """Average CRPS of an ensemble forecast, same score as pysteps.verification.probscores.CRPS
+
+    Uses the closed form CRPS = E|X - y| - 0.5 E|X - X'| evaluated on the sorted members of
+    each gridpoint. Gridpoints where the observation or any member is not finite are ignored.
+
+    Args:
+        ens (np.ndarray): ensemble forecast of shape (n_members, ...)
+        obs (np.ndarray): observations with the shape of a single member
+
+    Returns:
+        float: CRPS averaged over the valid gridpoints (nan if there are none)
+    """
+    crps = _crps_ensemble_points(ens, obs)
+    valid = np.isfinite(crps)
+    if not valid.any():
+        return np.nan
+    return crps[valid].mean()
+
+
+def cumulative_crps_ensemble(ens, obs):
+    """CRPS over the growing lead time prefixes of an ensemble forecast, from a single pass
+
+    Entry j is crps_ensemble(ens[:, :j], obs[:j]), obtained from the per lead time sums and
+    valid gridpoint counts so every gridpoint is scored only once.
+
+    Args:
+        ens (np.ndarray): ensemble forecast of shape (n_members, n_leadtimes, ...)
+        obs (np.ndarray): observations of shape (n_leadtimes, ...)
+
+    Returns:
+        np.ndarray: CRPS of shape (n_leadtimes,), nan where the prefix has no valid gridpoint
+    """
+    crps = _crps_ensemble_points(ens, obs).reshape(obs.shape[0], -1)
+    valid = np.isfinite(crps)
+    crps_sum = np.concatenate(([0.0], np.cumsum(np.where(valid, crps, 0.0).sum(axis=1))[:-1]))
+    n_valid = np.concatenate(([0], np.cumsum(valid.sum(axis=1))[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return crps_sum / n_valid
+
+
+@njit(nogil=True)
+def _contingency_kernel(pred, obs, thr):
+    counts = np.zeros((pred.shape[0], 3), dtype=np.int64)
+    for t in range(pred.shape[0]):
+        hits = 0
+        false_alarms = 0
+        misses = 0
+        for k in range(pred.shape[1]):
+            if not (np.isfinite(pred[t, k]) and np.isfinite(obs[t, k])):
+                continue
+            p = pred[t, k] > thr
+            o = obs[t, k] > thr
+            if p and o:
+                hits += 1
+            elif p:
+                false_alarms += 1
+            elif o:
+                misses += 1
+        counts[t, 0] = hits
+        counts[t, 1] = false_alarms
+        counts[t, 2] = misses
+    return counts
+
+
+def contingency_counts(pred, obs, thr):
+    """Hits, false alarms and misses of each frame of a forecast, thresholded with > like pysteps
+
+    The comparison and the counting are fused in a single loop, so no boolean masks are
+    allocated. Pairs where either value is not finite are skipped, as pysteps documents for
+    det_cat_fct ("NaNs are ignored").
+
+    Args:
+        pred (np.ndarray): forecast of shape (n_frames, ...)
+        obs (np.ndarray): observations of the same shape
+        thr (float): event threshold
+
+    Returns:
+        np.ndarray: counts of shape (n_frames, 3), columns being hits, false alarms and misses
+    """
+    pred = np.reshape(pred, (pred.shape[0], -1))
+    obs = np.reshape(obs, (obs.shape[0], -1))
+    return _contingency_kernel(pred, obs, thr)
@@ -83,6 +83,7 @@ class ModelPicker:
                 device = torch.device('cpu')
             
             model = DGMR.load_from_checkpoint(self.model_save_location, map_location=device)
+            self.device = device
             self.prediction_function = lambda y: model.predict_ensemble(y, n_ens_members= n_ens_members)
         elif self.model_type == 'dgmr_ir':
             if self.use_gpu and torch.cuda.is_available(): 
@@ -91,6 +92,7 @@ class ModelPicker:
                 device = torch.device('cpu')
             
             model = DGMR_IR.load_from_checkpoint(self.model_save_location, map_location=device)    
+            self.device = device
             self.prediction_function = lambda y, y_ir: model.predict_ensemble(y, y_ir, n_ens_members = n_ens_members)
             
     def load_data(self, input_h5_filename):
@@ -142,8 +144,7 @@ class ModelPicker:
                     
                 self.input_precip = self.input_precip[-self.config['in_seq_length']:, :, :]
                 # self.input_precip = np.transpose(self.input_precip, (2, 0, 1))
-                self.input_precip = torch.tensor(self.input_precip[:,None,:,:])
-                self.input_precip = torch.tensor(self.input_precip[None,:,:,:,:])
+                self.input_precip = torch.from_numpy(np.ascontiguousarray(self.input_precip))[None,:,None,:,:]
             else:
                 self.input_precip = samples
                 pred_out_images = self.prediction_function(self.input_precip)
@@ -165,8 +166,7 @@ class ModelPicker:
                     
                 self.input_precip = self.input_precip[-self.config['in_seq_length']:, :, :]
                 # self.input_precip = np.transpose(self.input_precip, (2, 0, 1))
-                self.input_precip = torch.tensor(self.input_precip[:,None,:,:])
-                self.input_precip = torch.tensor(self.input_precip[None,:,:,:,:])
+                self.input_precip = torch.from_numpy(np.ascontiguousarray(self.input_precip))[None,:,None,:,:]
                 
             else:
                 self.input_precip = samples
@@ -179,6 +179,25 @@ class ModelPicker:
             
             return pred_out_images
     
+    def predict_tensor(self, samples, samples_ir=None):
+        """Predict a batch of samples and return the output as a single torch tensor.
+
+        For dgmr and dgmr_ir the ensemble members are stacked on the model's device, so the caller
+        can rearrange the output there and copy only what it needs back to the host. Other models
+        go through predict() and their stacked output is wrapped with torch.from_numpy, which
+        shares the buffer instead of copying it like torch.tensor would.
+        """
+        if self.model_type in ['dgmr', 'dgmr_ir']:
+            self.input_precip = samples.to(self.device)
+            self.input_ir = samples_ir.to(self.device) if samples_ir is not None else None
+            with torch.no_grad():
+                if self.model_type == 'dgmr':
+                    pred_out_images = self.prediction_function(self.input_precip)
+                else:
+                    pred_out_images = self.prediction_function(self.input_precip, self.input_ir)
+            return torch.stack([x.detach() for x in pred_out_images])
+        return torch.from_numpy(np.ascontiguousarray(np.stack(self.predict(samples, samples_ir))))
+
     def save_output(self, output_h5_filename, output_precipitation):
         
         output_dt = [self.input_dt[-1] + datetime.timedelta(minutes=30*(k+1)) for k in range(self.config['out_seq_length'])]
@@ -1,129 +1,168 @@
 import json
 from servir.core.model_picker import ModelPicker
-from pysteps.verification.probscores import CRPS
+from servir.core.metrics import contingency_counts, cumulative_crps_ensemble
 import numpy as np
-import json
+import scipy.fft
 from servir.core.data_provider import IMERGDataModule
 from pysteps.utils.spectral import rapsd
-from pysteps.verification.detcatscores import det_cat_fct
-import torch
+from joblib import Parallel, delayed
+
+
+def frame_rapsd(frames):
+    """Radially averaged power spectrum of each 2D frame in a (T, H, W) stack, as a (T, n_freq) array."""
+    return np.stack([rapsd(frame, fft_method=scipy.fft) for frame in frames])
+
+
+def cumulative_csi(pred, obs, thr):
+    """CSI of the first j frames of a (T, H, W) forecast against the observations, for j in 0..T-1.
+
+    Equivalent to det_cat_fct(pred[0:j], obs[0:j], thr)['CSI'] for every j, with pairs where either
+    value is NaN left out, but the contingency table is counted once per frame and accumulated
+    instead of being recomputed for every prefix.
+    """
+    counts = contingency_counts(pred, obs, thr)
+    # prefix [0:j] excludes frame j, so shift the running totals by one frame
+    counts = np.concatenate((np.zeros((1, 3), dtype=counts.dtype), np.cumsum(counts, axis=0)[:-1]))
+    hits, false_alarms, misses = counts.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return hits / (hits + misses + false_alarms)
+
+
+def _score_sample(output, y_sample, thr):
+    # rapsd rejects NaNs, so the spectra are taken of NaN-filled copies; the CSI skips NaN pairs itself
+    return (frame_rapsd(np.nan_to_num(output)), frame_rapsd(np.nan_to_num(y_sample)),
+            cumulative_csi(output, y_sample, thr))
+
+
+def score_samples(outputs, y_samples, thr):
+    """frame_rapsd of each forecast and ground truth and their cumulative_csi, for a batch of (T, H, W) samples.
+
+    Samples are scored in threads, since the FFTs and the CSI kernel release the GIL. Returns the
+    forecast spectra, ground truth spectra and CSIs, each stacked over the samples.
+    """
+    scores = Parallel(n_jobs=-1, backend='threading')(
+        delayed(_score_sample)(output, y_sample, thr) for output, y_sample in zip(outputs, y_samples))
+    return tuple(np.stack(score) for score in zip(*scores))
+
 
 def evaluation(metadata_location, data_loader, thr, model_type, model_config_location, model_save_location, use_gpu, use_ensemble=False):
     
     with open(metadata_location) as jsonfile:
         geodata_dict = json.loads(jsonfile.read())
 
-    crps_dict = {model_type:{},
-                 'gt':{}
-                }
-
-    psd_dict = {model_type:{},
-                 'gt':{}
-                }
-
-    csi_dict = {model_type:{},
-                 'gt':{}
-                }
+    errored_out = 0
 
-    for j in range(12):
-        crps_dict[model_type][str(j)] = []
-        crps_dict['gt'][str(j)] = []
-        
-        psd_dict[model_type][str(j)] = []
-        psd_dict['gt'][str(j)] = []
-        
-        csi_dict[model_type][str(j)] = []
-        csi_dict['gt'][str(j)] = []
+    # scores are stored per (sample, lead time); samples whose prediction failed stay NaN
+    n_samples = len(data_loader.dataset)
+    crps_arr = np.full((n_samples, 12), np.nan, dtype=np.float32)
+    csi_arr = np.full((n_samples, 12), np.nan, dtype=np.float32)
+    # rapsd returns l//2 (+1 if l is odd) values for l = max(H, W)
+    img_size = max(data_loader.dataset[0][-1].shape[-2:])
+    psd_freq = np.fft.fftfreq(img_size)[:img_size // 2 + img_size % 2]
+    psd_arr = np.full((n_samples, 12, len(psd_freq)), np.nan, dtype=np.float32)
+    gt_psd_arr = np.full((n_samples, 12, len(psd_freq)), np.nan, dtype=np.float32)
         
     if use_ensemble:
         model_picker = ModelPicker(model_type, model_config_location, model_save_location, use_gpu)
         model_picker.load_model()
 
+        sample_offset = 0
         for index, data_sample_batch in enumerate(data_loader):
-            x, y = data_sample_batch
+            x, y = data_sample_batch[0], data_sample_batch[-1]
+            x_ir = data_sample_batch[1] if len(data_sample_batch) == 3 else None
+            y_np = y[:, :, 0].contiguous().numpy()
             print("starting predictions for batch {}".format(index))
             if model_type in ['steps', 'lagrangian', 'naive', 'linda']:
-                x = x.numpy()[:,:,0,:,:]
-                y = y.numpy()[:,:,0,:,:]
+                x = np.nan_to_num(x.numpy()[:,:,0,:,:], copy=False)
 
                 for data_sample_index in range(len(x)):
                     try:
-                        predicted_output = model_picker.predict(np.nan_to_num(x[data_sample_index]))
-                        for j in range(12):
-                            crps_dict[model_type][str(j)].append(CRPS(predicted_output[:,0:j,: ], y[data_sample_index][0:j]))
-                    except:
-                        pass
+                        predicted_output = model_picker.predict(x[data_sample_index])
+                    except (ValueError, np.linalg.LinAlgError) as e:
+                        print("prediction failed for sample {} of batch {}: {}".format(data_sample_index, index, e))
+                        errored_out += 1
+                        continue
+                    crps_arr[sample_offset + data_sample_index] = cumulative_crps_ensemble(predicted_output[:, :12], y_np[data_sample_index])
             elif model_type in ['dgmr']:
-                predicted_output = torch.tensor(model_picker.predict(x))
-                rearanged_output = predicted_output.numpy().transpose(1, 0, 2, 3, 4, 5)[:,:,:,0,:,:]
+                predicted_output = model_picker.predict_tensor(x)
+                rearanged_output = np.moveaxis(predicted_output[:, :, :, 0].cpu().numpy(), 0, 1)
                 for data_sample_index in range(len(rearanged_output)):
                     output = rearanged_output[data_sample_index]
-                    for j in range(12):
-                        crps_dict[model_type][str(j)].append(CRPS(output[:,0:j,:,:], y.numpy()[:,:,0,:,:][data_sample_index][0:j,:,:]))
+                    y_sample = y_np[data_sample_index]
+                    crps_arr[sample_offset + data_sample_index] = cumulative_crps_ensemble(output[:, :12], y_sample)
                     
             elif model_type in ['dgmr_ir']:
-                predicted_output = torch.tensor(model_picker.predict(x, x_ir))
+                if x_ir is None:
+                    raise ValueError("dgmr_ir needs a data loader yielding (x, x_ir, y) batches")
+                predicted_output = model_picker.predict_tensor(x, x_ir)
                 print(predicted_output.shape)
 
-                rearanged_output = predicted_output.numpy().transpose(1, 0, 2, 3, 4, 5)[:,:,:,0,:,:]
+                rearanged_output = np.moveaxis(predicted_output[:, :, :, 0].cpu().numpy(), 0, 1)
                 for data_sample_index in range(len(rearanged_output)):
                     output = rearanged_output[data_sample_index]
-                    for j in range(12):
-                        crps_dict[model_type][str(j)].append(CRPS(output[:,0:j,:,:], y.numpy()[:,:,0,:,:][data_sample_index][0:j,:,:]))
-            
+                    y_sample = y_np[data_sample_index]
+                    crps_arr[sample_offset + data_sample_index] = cumulative_crps_ensemble(output[:, :12], y_sample)
+            sample_offset += len(y_np)
 
-        np.save(model_type + '_crps.npy',crps_dict[model_type])
+        np.save(model_type + '_crps.npy',crps_arr)
 
     model_picker = ModelPicker(model_type, model_config_location,model_save_location, use_gpu)
     model_picker.load_model(get_ensemble=False)
-    errored_out = 0
 
+    sample_offset = 0
     for index, data_sample_batch in enumerate(data_loader):
-        x, y = data_sample_batch
+        x, y = data_sample_batch[0], data_sample_batch[-1]
+        x_ir = data_sample_batch[1] if len(data_sample_batch) == 3 else None
+        # NaNs are kept: the CSI skips them and _score_sample fills them only for rapsd
+        y_np = y[:, :, 0].contiguous().numpy()
         print("starting predictions for batch {}".format(index))
         if model_type in ['steps', 'lagrangian', 'naive', 'linda']:
             x = x.numpy()[:,:,0,:,:]
-            y = y.numpy()[:,:,0,:,:]
 
+            outputs = []
+            sample_indices = []
             for data_sample_index in range(len(x)):
                 try:
-                    predicted_output = np.nan_to_num(model_picker.predict(x[data_sample_index]))
-                    for j in range(12):
-                        csi_dict[model_type][str(j)].append(det_cat_fct(predicted_output[0,0:j,: ], y[data_sample_index][0:j], thr=thr)['CSI'])
-                        psd_dict[model_type][str(j)].append(rapsd(predicted_output[0,j,:], return_freq=True, fft_method = np.fft))
-                        psd_dict['gt'][str(j)].append(rapsd(y[data_sample_index][0:j], return_freq=True, fft_method = np.fft))
-                        
-                except:
+                    predicted_output = np.nan_to_num(model_picker.predict(x[data_sample_index]), copy=False)
+                except (ValueError, np.linalg.LinAlgError) as e:
+                    print("prediction failed for sample {} of batch {}: {}".format(data_sample_index, index, e))
                     errored_out += 1
+                    continue
+                outputs.append(predicted_output[0])
+                sample_indices.append(data_sample_index)
+            if outputs:
+                rows = sample_offset + np.array(sample_indices)
+                psd_arr[rows], gt_psd_arr[rows], csi_arr[rows] = score_samples(outputs, y_np[sample_indices], thr)
         elif model_type in ['dgmr', 'convlstm']:
             print("here")
-            predicted_output = torch.tensor(model_picker.predict(x))
+            predicted_output = model_picker.predict_tensor(x)
             print(predicted_output.shape)
 
-            rearanged_output = predicted_output.numpy().transpose(1, 0, 2, 3, 4, 5)[:,:,:,0,:,:]
-            for data_sample_index in range(len(rearanged_output)):
-                output = rearanged_output[data_sample_index]
-                for j in range(12):
-                    csi_dict[model_type][str(j)].append(det_cat_fct(output[0][0:j,:,:], y.numpy()[:,:,0,:,:][data_sample_index][0:j,:,:], thr=thr))
-                    psd_dict[model_type][str(j)].append(rapsd(output[0][j],return_freq=True, fft_method = np.fft))
-                    psd_dict['gt'][str(j)].append(rapsd(y.numpy()[:,:,0,:,:][data_sample_index][j,:,:],return_freq=True, fft_method = np.fft))
+            # only the first member is scored, so take it before copying to the host
+            first_member_output = predicted_output[0, :, :, 0].cpu().numpy()
+            rows = slice(sample_offset, sample_offset + len(first_member_output))
+            psd_arr[rows], gt_psd_arr[rows], csi_arr[rows] = score_samples(first_member_output, y_np, thr)
                     
         elif model_type in ['dgmr_ir']:
-            predicted_output = torch.tensor(model_picker.predict(x, x_ir))
+            if x_ir is None:
+                raise ValueError("dgmr_ir needs a data loader yielding (x, x_ir, y) batches")
+            predicted_output = model_picker.predict_tensor(x, x_ir)
             print(predicted_output.shape)
 
-            rearanged_output = predicted_output.numpy().transpose(1, 0, 2, 3, 4, 5)[:,:,:,0,:,:]
-            for data_sample_index in range(len(rearanged_output)):
-                output = rearanged_output[data_sample_index]
-                for j in range(12):
-                    csi_dict[model_type][str(j)].append(det_cat_fct(output[0][0:j,:,:], y.numpy()[:,:,0,:,:][data_sample_index][0:j,:,:], thr=thr))
-                    psd_dict[model_type][str(j)].append(rapsd(output[0][j], return_freq=True, fft_method = np.fft))
-                    psd_dict['gt'][str(j)].append(rapsd(y.numpy()[:,:,0,:,:][data_sample_index][j,:,:], return_freq=True, fft_method = np.fft))
+            # only the first member is scored, so take it before copying to the host
+            first_member_output = predicted_output[0, :, :, 0].cpu().numpy()
+            rows = slice(sample_offset, sample_offset + len(first_member_output))
+            psd_arr[rows], gt_psd_arr[rows], csi_arr[rows] = score_samples(first_member_output, y_np, thr)
+        sample_offset += len(y_np)
 
+    crps_dict = {model_type: crps_arr}
+    psd_dict = {model_type: psd_arr, 'gt': gt_psd_arr, 'freq': psd_freq}
+    csi_dict = {model_type: csi_arr}
 
-    np.save(model_type + '_rapsd.npy',psd_dict[model_type])
-    np.save('gt_rapsd.npy',psd_dict['gt'])
-    np.save(model_type + '_' +str(thr) + '_csi.npy',csi_dict[model_type])
+    np.save(model_type + '_rapsd.npy',psd_arr)
+    np.save('gt_rapsd.npy',gt_psd_arr)
+    np.save('rapsd_freq.npy',psd_freq)
+    np.save(model_type + '_' +str(thr) + '_csi.npy',csi_arr)
     print("total errored out = ", errored_out)
     
     return crps_dict, psd_dict, csi_dict
\ No newline at end of file
@@ -1,7 +1,6 @@
 from servir.core.model_picker import ModelPicker
 from pysteps.verification.probscores import CRPS
 import numpy as np
-import torch
 import json
 from servir.core.data_provider import IMERGDataModule
 from pysteps.utils.spectral import rapsd
@@ -106,18 +105,18 @@ if get_crps:
                 except:
                     pass
         elif model_type in ['dgmr']:
-            predicted_output = torch.tensor(model_picker.predict(x))
-            rearanged_output = predicted_output.numpy().transpose(1, 0, 2, 3, 4, 5)[:,:,:,0,:,:]
+            predicted_output = np.stack(model_picker.predict(x))
+            rearanged_output = np.moveaxis(predicted_output, 0, 1)[:, :, :, 0]
             for data_sample_index in range(len(rearanged_output)):
                 output = rearanged_output[data_sample_index]
                 for j in range(12):
                     crps_dict[model_type][str(j)].append(CRPS(output[:,0:j,:,:], y.numpy()[:,:,0,:,:][data_sample_index][0:j,:,:]))
                 
         elif model_type in ['dgmr_ir']:
-            predicted_output = torch.tensor(model_picker.predict(x, x_ir))
+            predicted_output = np.stack(model_picker.predict(x, x_ir))
             print(predicted_output.shape)
 
-            rearanged_output = predicted_output.numpy().transpose(1, 0, 2, 3, 4, 5)[:,:,:,0,:,:]
+            rearanged_output = np.moveaxis(predicted_output, 0, 1)[:, :, :, 0]
             for data_sample_index in range(len(rearanged_output)):
                 output = rearanged_output[data_sample_index]
                 for j in range(12):
@@ -147,10 +146,10 @@ for index, data_sample_batch in enumerate(data_loader):
             except:
                 errored_out += 1
     elif model_type in ['dgmr']:
-        predicted_output = torch.tensor(model_picker.predict(x))
+        predicted_output = np.stack(model_picker.predict(x))
         print(predicted_output.shape)
 
-        rearanged_output = predicted_output.numpy().transpose(1, 0, 2, 3, 4, 5)[:,:,:,0,:,:]
+        rearanged_output = np.moveaxis(predicted_output, 0, 1)[:, :, :, 0]
         for data_sample_index in range(len(rearanged_output)):
             output = rearanged_output[data_sample_index]
             for j in range(12):
@@ -159,10 +158,10 @@ for index, data_sample_batch in enumerate(data_loader):
                 psd_dict['gt'][str(j)].append(rapsd(y.numpy()[:,:,0,:,:][data_sample_index][j,:,:],return_freq=True, fft_method = np.fft))
                 
     elif model_type in ['dgmr_ir']:
-        predicted_output = torch.tensor(model_picker.predict(x, x_ir))
+        predicted_output = np.stack(model_picker.predict(x, x_ir))
         print(predicted_output.shape)
 
-        rearanged_output = predicted_output.numpy().transpose(1, 0, 2, 3, 4, 5)[:,:,:,0,:,:]
+        rearanged_output = np.moveaxis(predicted_output, 0, 1)[:, :, :, 0]
         for data_sample_index in range(len(rearanged_output)):
             output = rearanged_output[data_sample_index]
             for j in range(12):
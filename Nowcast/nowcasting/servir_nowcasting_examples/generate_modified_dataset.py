@@ -25,6 +25,23 @@ def dataloader_test():
         
         
 
+def write_buffers(h5_datasets, buffers, n_samples):
+    """Append the first n_samples rows of each buffer to its HDF5 dataset in a single write.
+
+    A buffer holding exactly one chunk that starts on a chunk boundary is written with
+    write_direct_chunk, bypassing the chunk cache; partial buffers go through a regular write.
+    """
+    for h5_dataset, buffer in zip(h5_datasets, buffers):
+        start = h5_dataset.shape[0]
+        h5_dataset.resize(start + n_samples, axis=0)
+        chunk_rows = h5_dataset.chunks[0]
+        if n_samples == chunk_rows and start % chunk_rows == 0:
+            offset = (start,) + (0,) * (h5_dataset.ndim - 1)
+            h5_dataset.id.write_direct_chunk(offset, buffer.tobytes())
+        else:
+            h5_dataset[start:start + n_samples] = buffer[:n_samples]
+
+
 def main():
     
     h5_dataset_location = "temp/ghana_imerg_2011_2020_Oct.h5"
@@ -66,68 +83,54 @@ def main():
                                 forecast_steps, 
                                 history_steps,
                                 image_shape=image_shape)
-    train_dataloader = DataLoader(train_dataset, batch_size=1, num_workers=2)
-    val_dataloader = DataLoader(val_dataset, batch_size=1, num_workers=2)
-    test_dataloader = DataLoader(test_dataset, batch_size=1, num_workers=2)
+    loader_kwargs = dict(batch_size=16, num_workers=2, pin_memory=torch.cuda.is_available(),
+                         persistent_workers=True, prefetch_factor=4)
+    train_dataloader = DataLoader(train_dataset, **loader_kwargs)
+    val_dataloader = DataLoader(val_dataset, **loader_kwargs)
+    test_dataloader = DataLoader(test_dataset, **loader_kwargs)
     
     
 
-    updated_x = None
-    updated_x_ir = None
-    updated_y = None
-    updated_lp_output = None
-    
     dataset = 'train'
+    # number of samples accumulated in memory before each HDF5 write, one dataset chunk
+    buffer_size = 128
+    # a chunk of the largest dataset is 128*16*64*64 float32 = 32 MiB, far above the 1 MiB default cache
+    h5_cache = dict(rdcc_nbytes=64*1024*1024, rdcc_nslots=100003)
+    
+    hf1 =  h5py.File('temp/{}_ir.h5'.format(dataset), 'w', **h5_cache)
+    hf2 =  h5py.File('temp/{}_input.h5'.format(dataset), 'w', **h5_cache)
+    hf3 =  h5py.File('temp/{}_output.h5'.format(dataset), 'w', **h5_cache)
+    hf4 =  h5py.File('temp/{}_lp_output.h5'.format(dataset), 'w', **h5_cache)
+    
+    ir_dataset = hf1.create_dataset('{}_ir'.format(dataset), shape=(0, 16,1,64,64), maxshape=(None, 16,1,64,64), chunks=(buffer_size, 16,1,64,64), dtype=np.float32)
+    input_dataset = hf2.create_dataset('{}_input'.format(dataset), shape=(0, 8,1,64,64), maxshape=(None, 8,1,64,64), chunks=(buffer_size, 8,1,64,64), dtype=np.float32)
+    y_dataset = hf3.create_dataset('{}_y'.format(dataset), shape=(0, 12,1,64,64), maxshape=(None, 12,1,64,64), chunks=(buffer_size, 12,1,64,64), dtype=np.float32)
+    lp_output_dataset = hf4.create_dataset('{}_lp_output'.format(dataset), shape=(0, 12,1,64,64), maxshape=(None, 12,1,64,64), chunks=(buffer_size, 12,1,64,64), dtype=np.float32)
+    h5_datasets = [ir_dataset, input_dataset, y_dataset, lp_output_dataset]
     
-    hf1 =  h5py.File('temp/{}_ir.h5'.format(dataset), 'w')
-    hf2 =  h5py.File('temp/{}_input.h5'.format(dataset), 'w')
-    hf3 =  h5py.File('temp/{}_output.h5'.format(dataset), 'w')
-    hf4 =  h5py.File('temp/{}_lp_output.h5'.format(dataset), 'w')
+    # preallocated in-memory buffers, flushed to the datasets once full
+    buffers = [np.empty((buffer_size,) + h5_dataset.shape[1:], dtype=np.float32) for h5_dataset in h5_datasets]
+    n_buffered = 0
     
     for index, sample in enumerate(train_dataloader):
         print(index)
-        x, x_ir, y = sample
-        predicted_precip = model_picker.predict(x[0, :, 0, :, :].numpy())
-        predicted_precip = predicted_precip[None, :,None, :, :]
-        precip_difference = predicted_precip - y.numpy()
-        
-        if updated_x is None:
-            updated_x = x
-            updated_x_ir = x_ir
-            updated_y = precip_difference
-            updated_lp_output = predicted_precip
-            # write to h5 file
-            ir_dataset = hf1.create_dataset('{}_ir'.format(dataset), data = updated_x_ir, maxshape=(None, 16,1,64,64))
-            input_dataset = hf2.create_dataset('{}_input'.format(dataset), data = updated_x, maxshape=(None, 8,1,64,64))
-            y_dataset = hf3.create_dataset('{}_y'.format(dataset), data = updated_y, maxshape=(None, 12,1,64,64))
-            lp_output_dataset = hf4.create_dataset('{}_lp_output'.format(dataset), data = updated_lp_output,  maxshape=(None, 12,1,64,64))
-            
-            # with h5py.File('temp/{}_ir.h5'.format(dataset), 'w') as hf:
-            #     ir_dataset = hf.create_dataset('{}_ir'.format(dataset), data = updated_x_ir)
-            # with h5py.File('temp/{}_input.h5'.format(dataset), 'w') as hf:
-            #     input_dataset = hf.create_dataset('{}_input'.format(dataset), data = updated_x)
-            # with h5py.File('temp/{}_output.h5'.format(dataset), 'w') as hf:
-            #     y_dataset = hf.create_dataset('{}_y'.format(dataset), data = updated_y)
-            # with h5py.File('temp/{}_lp_output.h5'.format(dataset), 'w') as hf:
-            #     lp_output_dataset = hf.create_dataset('{}_lp_output'.format(dataset), data = updated_lp_output)
-        else:
-            ir_dataset.resize(ir_dataset.shape[0]+1, axis=0)
-            ir_dataset[-1:] = x_ir
-            
+        x, x_ir, y = [t.numpy() for t in sample]
+        for sample_index in range(len(x)):
+            predicted_precip = model_picker.predict(x[sample_index, :, 0, :, :])
+            predicted_precip = predicted_precip[:,None, :, :]
             
-            input_dataset.resize(input_dataset.shape[0]+1, axis=0)
-            input_dataset[-1:] = x
+            buffers[0][n_buffered] = x_ir[sample_index]
+            buffers[1][n_buffered] = x[sample_index]
+            buffers[2][n_buffered] = predicted_precip - y[sample_index]
+            buffers[3][n_buffered] = predicted_precip
+            n_buffered += 1
             
-            y_dataset.resize(y_dataset.shape[0]+1, axis=0)
-            y_dataset[-1:] = precip_difference
-            
-            lp_output_dataset.resize(lp_output_dataset.shape[0]+1, axis=0)
-            lp_output_dataset[-1:] = predicted_precip
-            
-            # updated_x = np.concatenate((updated_x, x))
-            # updated_x_ir = np.concatenate((updated_x_ir, x_ir))
-            # updated_y = np.concatenate((updated_y, precip_difference))
-            # updated_lp_output = np.concatenate((updated_lp_output, predicted_precip))
+            if n_buffered == buffer_size:
+                write_buffers(h5_datasets, buffers, n_buffered)
+                n_buffered = 0
+    
+    if n_buffered > 0:
+        write_buffers(h5_datasets, buffers, n_buffered)
         
     hf1.close()
     hf2.close()
@@ -16,22 +16,20 @@ Please use this script and a configuration file as follows:
 
 """
 
-from shutil import rmtree, copy
-import os
-from os import makedirs, listdir, rename, remove
-import glob
-from datetime import datetime as dt
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 import numpy as np
-import re
-import subprocess
 import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import osgeo.gdal as gdal
 from tito_utils.file_utils import cleanup_precip, newline
-from tito_utils.qpe_utils import get_new_precip
+from tito_utils.qpe_utils import get_new_precip, prefetch_imerg_listings
 from tito_utils.qpf_utils import run_convlstm, download_GFS, GFS_searcher, WRF_searcher 
-from tito_utils.ef5 import prepare_ef5, run_ef5_simulation
+from tito_utils.ef5 import prepare_ef5, find_available_states, run_ef5_simulation
 print(">>> Modules imported")
 
+logger = logging.getLogger(__name__)
+
 """
 Setup Environment Variables for Linux Shared Libraries and OpenMP Threads (PARA USAR ML de AGRHYMET)
 
@@ -46,6 +44,10 @@ def main(args):
         args {list} -- the first argument ([1]) corresponds to a real-time configuration file.
     """
     ###-------------------------- SETTING SECTION --------------------------------
+    # Larger raster block cache and multithreaded GeoTIFF compression for the grids written below
+    gdal.SetConfigOption('GDAL_CACHEMAX', '512')
+    gdal.SetConfigOption('GDAL_NUM_THREADS', 'ALL_CPUS')
+    
     #set true of False to fill 4h imerg latency and create +2h hours (nowcast)
     NOWCAST = True 
     
@@ -95,9 +97,9 @@ def main(args):
     # Real-time mode or Hindcast mode
     # Figure out the timing for running the current timestep
     if HindCastMode == True:
-        currentTime = dt.strptime(HindCastDate, "%Y-%m-%d %H:%M")
+        currentTime = datetime.strptime(HindCastDate, "%Y-%m-%d %H:%M")
     else:
-        currentTime = dt.datetime.now(dt.timezone.utc)
+        currentTime = datetime.now(timezone.utc).replace(tzinfo=None)
     
     # Round down the current minutess to the nearest 30min increment in the past (for 30 forecast)
     if systemTimestep == 30:
@@ -124,8 +126,8 @@ def main(args):
     # Only check for states as far as we have QPs (6 hours)
     failTime = currentTime - timedelta(hours=6)
     
-    systemStartLRTime = dt.strptime(config_file.StartLRtime,"%Y-%m-%d %H:%M")
-    EndLRTime = dt.strptime(config_file.EndLRTime,"%Y-%m-%d %H:%M")
+    systemStartLRTime = datetime.strptime(config_file.StartLRtime,"%Y-%m-%d %H:%M")
+    EndLRTime = datetime.strptime(config_file.EndLRTime,"%Y-%m-%d %H:%M")
     
     if HindCastMode and LR_run:
         systemEndTime = EndLRTime + timedelta(hours=4) #4 hours dry
@@ -140,6 +142,15 @@ def main(args):
         systemEndTime = currentTime + timedelta(hours=6) #si no corro gfs y hindcast no
         
     ###-------------------------- START ROUTINES --------------------------------
+    # The state search only reads the states folder, so it runs in the background while the
+    # precipitation is prepared. Its result is handed to prepare_ef5.
+    # The IMERG server listings only read the server, so they are fetched while the precip folder is
+    # cleaned up. The cleanup itself stays in the foreground because get_new_precip works from the
+    # folder and QPF store it leaves behind.
+    states_executor = ThreadPoolExecutor(max_workers=2)
+    states_search = states_executor.submit(find_available_states, statesPath, modelStates, systemStartTime, failTime)
+    states_executor.submit(prefetch_imerg_listings, server, email_gpm, HindCastMode, currentTime)
+    
     try:
         # Clean up old QPE files from GeoTIFF archive (older than 6 hours)
         # Keep latest QPFs
@@ -155,8 +166,8 @@ def main(args):
         newline(1)
         print("***_________IMERG files are complete in precip folder_________***")
         newline(2)
-    except:
-        print("There was a problem with the QPE routines. Ignoring errors and continuing with execution")
+    except Exception:
+        logger.exception("There was a problem with the QPE routines. Ignoring errors and continuing with execution")
         
     ###-------------------------- START NOWCAST SECTION --------------------------------      
     if NOWCAST:
@@ -167,8 +178,8 @@ def main(args):
             newline(1)
             print("***_________Nowcast/ML files are complete in precip folder_________***")
             newline(2)
-        except:
-            print("There was a problem with the ML routines. Ignoring errors and continuing with execution")
+        except Exception:
+            logger.exception("There was a problem with the ML routines. Ignoring errors and continuing with execution")
             
     ###-------------------------- START LR-QPF SECTION --------------------------------
     if LR_run:
@@ -182,8 +193,8 @@ def main(args):
             # filename_template = "PREC_d01_YYYY-MM-DD_HH_mm_SS.nc"
             # WRF_archive_path = config_file.QPF_archive_path
             # WRF_searcher(WRF_archive_path, qpf_store_path, systemStartLRTime, EndLRTime, LR_timestep, var_name, filename_template)
-        except:
-            ("There was a problem with the QPF routines. Ignoring errors and continuing with execution")
+        except Exception:
+            logger.exception("There was a problem with the QPF routines. Ignoring errors and continuing with execution")
         newline(1)
         print("***_________All QPE + QPF files are ready in local folder_________***")
     newline(2)
@@ -194,14 +205,16 @@ def main(args):
         systemStartTime, failTime, currentTime, systemName, SEND_ALERTS, 
         alert_recipients, smtp_config, tmpOutput, dataPath, 
         subdomain, systemModel, templatePath, template, systemStartLRTime, 
-        systemWarmEndTime, systemStateEndTime, systemEndTime, LR_TimeStep, LR_run)
+        systemWarmEndTime, systemStateEndTime, systemEndTime, LR_TimeStep, LR_run,
+        found_states=states_search.result())
+    states_executor.shutdown()
     
     print(f"    Running simulation system for: {currentTime.strftime("%Y%m%d_%H%M")}")
     print(f"    Simulations start at: {realSystemStartTime.strftime("%Y%m%d_%H%M")} and ends at: {systemEndTime.strftime("%Y%m%d_%H%M")} while state update ends at: {systemStateEndTime.strftime("%Y%m%d_%H%M")}")
     
     print("***_________EF5 is ready to be run_________***")
     
-    run_ef5_simulation(ef5Path, tmpOutput, controlFile)
+    run_ef5_simulation(ef5Path, tmpOutput, controlFile, precipEF5Folder)
     newline(2)
     print("******** EF5 Outputs are ready!!! ********")
              
@@ -209,5 +222,11 @@ def main(args):
 Run the main() function when invoked as a script
 """
 if __name__ == "__main__":
+    # Timestamped records on stdout, interleaved with the progress prints; INFO and above
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        stream=sys.stdout,
+    )
     main(sys.argv)
 
@@ -0,0 +1,32 @@
+import os
+
+from tito_utils.file_utils.file_handling import link_or_copy, move_file
+
+
+def test_move_file_onto_hardlink_twin_removes_source(tmp_path):
+    store = tmp_path / "qpf_store"
+    precip = tmp_path / "precip"
+    store.mkdir()
+    precip.mkdir()
+    stored = store / "gfs.qpf.202401010000.tif"
+    stored.write_bytes(b"qpf")
+    linked = precip / stored.name
+    link_or_copy(str(stored), str(linked))
+
+    move_file(str(linked), str(stored))
+
+    assert not linked.exists()
+    assert stored.read_bytes() == b"qpf"
+
+
+def test_move_file_renames_distinct_file(tmp_path):
+    src = tmp_path / "a.tif"
+    dst = tmp_path / "b.tif"
+    src.write_bytes(b"new")
+    dst.write_bytes(b"old")
+
+    move_file(str(src), str(dst))
+
+    assert not src.exists()
+    assert dst.read_bytes() == b"new"
+    assert os.stat(dst).st_nlink == 1
@@ -1,5 +1,5 @@
-from .ef5_routines import (prepare_ef5, run_ef5_simulation)
-from .alerts import send_mail
+from .ef5_routines import (prepare_ef5, find_available_states, run_ef5_simulation)
+from .alerts import (send_mail, smtp_connect, smtp_send)
 
 
-__all__ = ['prepare_ef5','run_ef5_simulation','send_mail']
\ No newline at end of file
+__all__ = ['prepare_ef5','find_available_states','run_ef5_simulation','send_mail','smtp_connect','smtp_send']
\ No newline at end of file
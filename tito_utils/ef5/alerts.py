@@ -2,34 +2,79 @@ import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-def send_mail(smtp_server, smtp_port, account_address, account_password,
-              sender, to, subject, text):
+def smtp_connect(smtp_server, smtp_port, account_address, account_password):
     """
-    Envía un correo electrónico con un mensaje de texto plano.
+    Abre una conexión SMTP autenticada (EHLO, STARTTLS, LOGIN) que se puede
+    reutilizar para varios envíos.
 
     Args:
         smtp_server (str): dirección del servidor SMTP
         smtp_port (int): puerto del servidor SMTP
         account_address (str): cuenta de correo remitente
         account_password (str): contraseña de la cuenta remitente
+
+    Returns:
+        smtplib.SMTP: conexión lista para enviar
+    """
+    server = smtplib.SMTP(smtp_server, smtp_port)
+    try:
+        server.ehlo()
+        server.starttls()
+        server.login(account_address, account_password)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+def smtp_send(server, sender, to, subject, text):
+    """
+    Envía un mensaje de texto plano por una conexión abierta, a todos los
+    destinatarios en una sola transacción (un RCPT TO por destinatario).
+    Con varios destinatarios la cabecera To es "undisclosed-recipients:;",
+    para que ninguno vea las direcciones de los demás.
+
+    Args:
+        server (smtplib.SMTP): conexión devuelta por smtp_connect
         sender (str): nombre que aparecerá como remitente
-        to (str): correo del destinatario
+        to (str | list): correo o lista de correos de los destinatarios
         subject (str): asunto del correo
         text (str): cuerpo del mensaje
+
+    Returns:
+        dict: destinatarios rechazados por el servidor, {correo: (código, respuesta)}
     """
+    recipients = [to] if isinstance(to, str) else list(to)
     msg = MIMEMultipart()
     msg['From'] = sender
-    msg['To'] = to
+    msg['To'] = recipients[0] if len(recipients) == 1 else "undisclosed-recipients:;"
     msg['Subject'] = subject
     msg.attach(MIMEText(text))
+    return server.send_message(msg, from_addr=sender, to_addrs=recipients)
 
+def send_mail(smtp_server, smtp_port, account_address, account_password,
+              sender, to, subject, text):
+    """
+    Envía un correo electrónico con un mensaje de texto plano.
+
+    Args:
+        smtp_server (str): dirección del servidor SMTP
+        smtp_port (int): puerto del servidor SMTP
+        account_address (str): cuenta de correo remitente
+        account_password (str): contraseña de la cuenta remitente
+        sender (str): nombre que aparecerá como remitente
+        to (str | list): correo o lista de correos de los destinatarios,
+            todos servidos por una sola conexión
+        subject (str): asunto del correo
+        text (str): cuerpo del mensaje
+    """
     try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.ehlo()
-        server.starttls()
-        server.login(account_address, account_password)
-        server.sendmail(sender, to, msg.as_string())
-        server.quit()
-        print(f"Email sent to {to} with subject '{subject}'")
+        with smtp_connect(smtp_server, smtp_port, account_address, account_password) as server:
+            refused = smtp_send(server, sender, to, subject, text)
+        for address, (code, reply) in refused.items():
+            print(f"Email to {address} was refused by the server: {code} {reply!r}")
+        recipients = [to] if isinstance(to, str) else list(to)
+        accepted = [address for address in recipients if address not in refused]
+        if accepted:
+            print(f"Email sent to {', '.join(accepted)} with subject '{subject}'")
     except Exception as e:
         print(f"Failed to send email to {to}. Error: {e}")
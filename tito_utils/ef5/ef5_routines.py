@@ -1,37 +1,35 @@
 import os
 import shutil
 import re
-import glob
-from shutil import rmtree
-import datetime
+from collections import defaultdict
+from functools import lru_cache
 from datetime import timedelta
-from multiprocessing.pool import ThreadPool
 import subprocess
-from tito_utils.file_utils.file_handling import is_non_zero_file, mkdir_p
+from tito_utils.file_utils.file_handling import iter_tifs, mkdir_p, link_or_copy
+from tito_utils.file_utils.fast_copy import batch_copy
 from tito_utils.ef5.alerts import send_mail
 
+# Whole lines of the control template holding the QPE and QPF simulation tasks
+QPE_TASK_LINE = re.compile(r'^.*task=Simulation_QPE.*\n?', re.MULTILINE)
+QPF_TASK_LINE = re.compile(r'^.*task=Simulation_QPF.*\n?', re.MULTILINE)
+# States are searched in half-hour steps
+_TD_30M = timedelta(minutes=30)
+# State files are named <state>_<YYYYmmdd_HHMM>.tif
+STATE_FILE = re.compile(r'(.+)_(\d{8}_\d{4})\.tif$')
+
 def rename_ef5_precip(precipEF5Folder, precipFolder): 
     """
     Move the qpe and qpf files into precipEF5folder to be ingested by EF5 using
-    a unify format.
+    a unify format. Files are hardlinked straight to their qpe name, falling back
+    to a copy across filesystems.
     """   
-    for filename in os.listdir(precipFolder):
-        if filename.endswith('.tif'):
-            source_file = os.path.join(precipFolder, filename)
-            dest_file = os.path.join(precipEF5Folder, filename)
-            try:
-                shutil.copy(source_file, dest_file)
-            except PermissionError as e:
-                print(f"PermissionError: {e}")
-    for filename2 in os.listdir(precipEF5Folder):
-        if 'qpf' in filename2 and filename2.endswith('.tif'):
-            new_filename = filename2.replace('qpf', 'qpe')
-            source_file = os.path.join(precipEF5Folder, filename2)
-            dest_file = os.path.join(precipEF5Folder, new_filename)
-            try:
-                os.rename(source_file, dest_file)
-            except PermissionError as e:
-                print(f"PermissionError: {e}")
+    names = [entry.name for entry in iter_tifs(precipFolder)]
+    # QPFs go last so they replace a QPE of the same name, as the rename used to
+    names.sort(key=lambda filename: 'qpf' in filename)
+    links = [(os.path.join(precipFolder, filename), os.path.join(precipEF5Folder, filename.replace('qpf', 'qpe')))
+             for filename in names]
+    for source_file, dest_file, e in batch_copy(links, copy_function=link_or_copy):
+        print(f"{type(e).__name__}: {e}")
 
 
 def find_available_states(statesPath, modelStates, systemStartTime, failTime):
@@ -39,24 +37,36 @@ def find_available_states(statesPath, modelStates, systemStartTime, failTime):
     Look for the set of most recent states available.
     
     """
-    foundAllStates = False
-    realSystemStartTime = systemStartTime
-
     print("    Looking for states.")
 
-    # Iterate over all necessary states and check if they're available for the current run
-    # Only go back up to 6 hours, in 30min decrements
-    while not foundAllStates and realSystemStartTime > failTime:
-        foundAllStates = True
-        for state in modelStates:
-            state_path = f"{statesPath}{state}_{realSystemStartTime.strftime('%Y%m%d_%H%M')}.tif"
-            if not is_non_zero_file(state_path):
-                print(f"    Missing start state: {state_path}")
-                foundAllStates = False
-        if not foundAllStates:
-            realSystemStartTime -= timedelta(minutes=30)
-
-    return foundAllStates, realSystemStartTime
+    # Candidate start times, only going back up to 6 hours, in 30min decrements
+    candidates = []
+    realSystemStartTime = systemStartTime
+    while realSystemStartTime > failTime:
+        candidates.append((realSystemStartTime, realSystemStartTime.strftime('%Y%m%d_%H%M')))
+        realSystemStartTime -= _TD_30M
+    candidate_stamps = {stamp for _, stamp in candidates}
+
+    # Enumerate the states folder once and keep the non-empty states of the candidate times
+    present = defaultdict(set)
+    try:
+        with os.scandir(statesPath) as entries:
+            for entry in entries:
+                match = STATE_FILE.match(entry.name)
+                if match and match.group(2) in candidate_stamps and entry.is_file() and entry.stat().st_size > 0:
+                    present[match.group(2)].add(match.group(1))
+    except FileNotFoundError:
+        pass
+
+    # Pick the most recent candidate for which all the states are available
+    for candidate, stamp in candidates:
+        missing = [state for state in modelStates if state not in present[stamp]]
+        if not missing:
+            return True, candidate
+        for state in missing:
+            print(f"    Missing start state: {os.path.join(statesPath, f'{state}_{stamp}.tif')}")
+
+    return False, realSystemStartTime
 
 
 def send_state_alerts(foundAllStates,realSystemStartTime,systemStartTime,currentTime,systemName,SEND_ALERTS,alert_recipients, smtp_config):
@@ -102,55 +112,69 @@ def send_state_alerts(foundAllStates,realSystemStartTime,systemStartTime,current
     else:
         return
 
-    # Send the email to each recipient in the list
-    for recipient in alert_recipients:
-        send_mail(
-            smtp_server=smtp_config['smtp_server'],
-            smtp_port=smtp_config['smtp_port'],
-            account_address=smtp_config['account_address'],
-            account_password=smtp_config['account_password'],
-            sender=smtp_config['alert_sender'],
-            to=recipient,
-            subject=subject,
-            text=message
-        )
+    # Send the email to all the recipients in the list over a single connection
+    send_mail(
+        smtp_server=smtp_config['smtp_server'],
+        smtp_port=smtp_config['smtp_port'],
+        account_address=smtp_config['account_address'],
+        account_password=smtp_config['account_password'],
+        sender=smtp_config['alert_sender'],
+        to=list(alert_recipients),
+        subject=subject,
+        text=message
+    )
+
+@lru_cache(maxsize=8)
+def load_template(template_file):
+    """
+    Read a control file template. The templates do not change during a run, so each one is
+    read from disk only once.
+    """
+    with open(template_file) as fIn:
+        return fIn.read()
+
+@lru_cache(maxsize=8)
+def load_task_template(template_file, LR_run):
+    """
+    Control file template with the simulation task lines of the run mode already toggled, so
+    the task patterns scan each template once instead of on every control file written.
+    """
+    control = load_template(template_file)
+    if LR_run:                      # QPF mode
+        control = QPE_TASK_LINE.sub("#task=Simulation_QPE\n", control)   # comment QPE
+        control = QPF_TASK_LINE.sub("task=Simulation_QPF\n", control)    # uncomment QPF
+    else:
+        control = QPF_TASK_LINE.sub("#task=Simulation_QPF\n", control)   # comment QPF
+    return control
 
 def write_control_file(tmpOutput, dataPath, subdomain, systemModel,templatePath, template, statesPath, realSystemStartTime, systemStartLRTime, systemWarmEndTime, systemStateEndTime, systemEndTime, LR_TimeStep, LR_run):
     # Clean up "Hot" folders
     # Delete the previously existing "Hot" folders, ignore error if it doesn't exist
-    rmtree(tmpOutput, ignore_errors=1)
-    rmtree(dataPath, ignore_errors=1)
+    shutil.rmtree(tmpOutput, ignore_errors=1)
+    shutil.rmtree(dataPath, ignore_errors=1)
     # Create the "Hot" folder for the current run
     mkdir_p(tmpOutput)
     mkdir_p(dataPath)  
     # Create the control files for both subdomains
     # Define the control file path to create
-    controlFile = tmpOutput + "WA_" + subdomain + "_" + systemModel + ".txt"
-    fOut = open(controlFile, "w")
-
-    # Create a control file with updated fields
-    for line in open(templatePath + template).readlines():
-        line = re.sub('{OUTPUTPATH}', tmpOutput, line)
-        line = re.sub('{STATESPATH}', statesPath, line)
-        line = re.sub('{TIMEBEGIN}', realSystemStartTime.strftime('%Y%m%d%H%M'), line)
-        line = re.sub('{TIMEWARMEND}', systemWarmEndTime.strftime('%Y%m%d%H%M'), line)
-        line = re.sub('{TIMESTATE}', systemStateEndTime.strftime('%Y%m%d%H%M'), line)
-        line = re.sub('{TIMEEND}', systemEndTime.strftime('%Y%m%d%H%M'), line)
-        line = re.sub('{TIMEBEGINLR}', systemStartLRTime.strftime('%Y%m%d%H%M'), line)
-        line = re.sub('{TIMESTEPLR}', LR_TimeStep, line)
-        line = re.sub('{SYSTEMMODEL}', systemModel, line)
-        
-        if "task=Simulation_QPE" in line:
-            if LR_run:                      # QPF mode
-                line = "#task=Simulation_QPE\n"   # comment QPE
-        elif "task=Simulation_QPF" in line:
-            if LR_run:
-                line = "task=Simulation_QPF\n"    # uncomment QPF
-            else:
-                line = "#task=Simulation_QPF\n"   # comment QPF
-        fOut.write(line)
-        
-    fOut.close()
+    controlFile = os.path.join(tmpOutput, f"WA_{subdomain}_{systemModel}.txt")
+
+    # Fill every {PLACEHOLDER} of the template in a single pass
+    fields = {
+        'OUTPUTPATH': tmpOutput,
+        'STATESPATH': statesPath,
+        'TIMEBEGIN': realSystemStartTime.strftime('%Y%m%d%H%M'),
+        'TIMEWARMEND': systemWarmEndTime.strftime('%Y%m%d%H%M'),
+        'TIMESTATE': systemStateEndTime.strftime('%Y%m%d%H%M'),
+        'TIMEEND': systemEndTime.strftime('%Y%m%d%H%M'),
+        'TIMEBEGINLR': systemStartLRTime.strftime('%Y%m%d%H%M'),
+        'TIMESTEPLR': LR_TimeStep,
+        'SYSTEMMODEL': systemModel,
+    }
+    control = load_task_template(os.path.join(templatePath, template), bool(LR_run)).format_map(fields)
+
+    with open(controlFile, "w") as fOut:
+        fOut.write(control)
     return controlFile
 
 def run_EF5(ef5Path, hot_folder_path, control_file, log_file):
@@ -161,34 +185,47 @@ def run_EF5(ef5Path, hot_folder_path, control_file, log_file):
         hot_folder_path {str} -- Path to the current run's "hot" foler
         control_file {str} -- path to the control file fir the simulation
         log_file {str} -- path to the log file for this run
+
+    Returns:
+        int -- EF5 exit code
     """
-    subprocess.call(ef5Path + " " + control_file + " > " + hot_folder_path + log_file, shell=True)
+    # Run the binary directly, without a shell, writing its output to the log file
+    with open(os.path.join(hot_folder_path, log_file), 'wb', buffering=1 << 20) as log:
+        proc = subprocess.Popen([ef5Path, control_file], stdout=log, stderr=subprocess.STDOUT)
+        return proc.wait()
 
 
-def run_ef5_simulation(ef5Path, tmpOutput, controlFile):
-    args = [ef5Path, tmpOutput, controlFile, "ef5.log"]
-    tp = ThreadPool(1)
-    tp.apply_async(run_EF5, args)
-    tp.close()
-    tp.join()
-    #cleaning EF5 precipitation for next cycle
-    for f in glob.glob("precipEF5/*"):
-        os.remove(f)
+def run_ef5_simulation(ef5Path, tmpOutput, controlFile, precipEF5Folder="precipEF5"):
+    """
+    Run EF5 and clean the EF5 precipitation folder for the next cycle. Raises
+    RuntimeError when EF5 exits with an error, after the cleanup.
+    """
+    try:
+        returncode = run_EF5(ef5Path, tmpOutput, controlFile, "ef5.log")
+    finally:
+        #cleaning EF5 precipitation for next cycle
+        with os.scandir(precipEF5Folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    os.unlink(entry.path)
+    if returncode:
+        raise RuntimeError(f"EF5 exited with code {returncode}, see {os.path.join(tmpOutput, 'ef5.log')}")
 
  
 def prepare_ef5(precipEF5Folder, precipFolder, statesPath, modelStates, 
     systemStartTime, failTime, currentTime, systemName, SEND_ALERTS, 
     alert_recipients, smtp_config, tmpOutput, dataPath, 
     subdomain, systemModel, templatePath, template, systemStartLRTime, 
-    systemWarmEndTime, systemStateEndTime, systemEndTime, LR_TimeStep, LR_run):
+    systemWarmEndTime, systemStateEndTime, systemEndTime, LR_TimeStep, LR_run, found_states=None):
 
     #copying precip files into folder 
     rename_ef5_precip(precipEF5Folder, precipFolder) 
 
     # Check to see if all the states for the current time step are available: ["crest_SM", "kwr_IR", "kwr_pCQ", "kwr_pOQ"]
-    # If not then search for previous ones
-
-    foundAllStates, realSystemStartTime = find_available_states(statesPath, modelStates, systemStartTime, failTime)
+    # If not then search for previous ones, unless the caller already did (found_states)
+    if found_states is None:
+        found_states = find_available_states(statesPath, modelStates, systemStartTime, failTime)
+    foundAllStates, realSystemStartTime = found_states
 
     # send alerts if needed 
     send_state_alerts(foundAllStates, realSystemStartTime, systemStartTime,
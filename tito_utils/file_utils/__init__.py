@@ -1,17 +1,28 @@
 from .cleanup import cleanup_precip
 from .datetime_utils import (
+    parse_stamp,
     get_geotiff_datetime,
+    get_geotiff_stamp,
     extract_timestamp,
     extract_datetime_from_filename
 )
-from .file_handling import (is_non_zero_file, mkdir_p, newline)
+from .file_handling import (is_non_zero_file, iter_tifs, mkdir_p, link_or_copy, move_file, newline)
+from .fast_copy import batch_copy
+from .dir_cache import DirSnapshot
 
 __all__ = [
     'cleanup_precip',
+    'parse_stamp',
     'get_geotiff_datetime',
+    'get_geotiff_stamp',
     'extract_timestamp',
     'extract_datetime_from_filename',
     'is_non_zero_file',
+    'iter_tifs',
     'mkdir_p',
-    'newline'
+    'link_or_copy',
+    'move_file',
+    'newline',
+    'batch_copy',
+    'DirSnapshot'
 ]
\ No newline at end of file
@@ -1,7 +1,24 @@
 import os            
-import shutil        
+import re
+import logging
 from datetime import timedelta  
-from tito_utils.file_utils.datetime_utils import get_geotiff_datetime
+from tito_utils.file_utils.file_handling import iter_tifs, move_file
+
+logger = logging.getLogger(__name__)
+
+# Age limits of the QPE files kept in the precip folder
+_TD_9H30 = timedelta(hours=9.5)
+_TD_4H = timedelta(hours=4)
+
+# Precip geotiffs are named <product>.<type>.<YYYYmmddHHMM>.tif
+_TS_RE = re.compile(r'\.(\d{12})\.')
+
+def _file_stamp(filename):
+    """YYYYmmddHHMM timestamp of a precip file from its name; ValueError if the name has none."""
+    match = _TS_RE.search(filename)
+    if match is None:
+        raise ValueError(f"'{filename}' has no YYYYmmddHHMM timestamp")
+    return match.group(1)
 
 def cleanup_precip(current_datetime, precipFolder, qpf_store_path):
     """Function that cleans up the precip folder for the current EF5 run
@@ -12,63 +29,43 @@ def cleanup_precip(current_datetime, precipFolder, qpf_store_path):
         precipFolder {str} -- path to the geotiff precipitation folder
         qpf_store_path {str} -- path to the folder where QPF files are stored
     """
-    qpes = []
-    qpfs = []
-    older_QPE = current_datetime - timedelta(hours=9.5)
-    imerg_Latency = current_datetime - timedelta(hours=4)
+    older_QPE = current_datetime - _TD_9H30
+    imerg_Latency = current_datetime - _TD_4H
+    # Filename stamps sort like datetimes, so the thresholds are compared as strings
+    older_QPE_stamp = older_QPE.strftime('%Y%m%d%H%M')
+    imerg_Latency_stamp = imerg_Latency.strftime('%Y%m%d%H%M')
+    current_stamp = current_datetime.strftime('%Y%m%d%H%M')
     
     try:
-        # List all precip files
-        precip_files = os.listdir(precipFolder)
-
-        # Segregate between QPEs and QPFs
-        for file in precip_files:
-            if "qpe" in file:
-                qpes.append(file)
-            elif "qpf" in file:
-                qpfs.append(file)
-
         print("    Deleting all QPE files older than Fail Time: ", older_QPE)
-        for qpe in qpes:
-            try:
-                geotiff_datetime = get_geotiff_datetime(precipFolder + qpe)
-                if geotiff_datetime < older_QPE:
-                    os.remove(precipFolder + qpe)
-            except Exception as e:
-                print(f"Error processing QPE file {qpe}: {e}")
-
-        print("    Deleting all QPF files older than Current Time: ", current_datetime)
-        print("    Copying all QPF files older than Current Time: ", current_datetime, " into qpf_store folder.")
-        for qpf in qpfs:
-            try:
-                geotiff_datetime = get_geotiff_datetime(precipFolder + qpf)
-                if geotiff_datetime < current_datetime:
-                    shutil.copy2(precipFolder + qpf, qpf_store_path)
-                os.remove(precipFolder + qpf)
-            except Exception as e:
-                print(f"Error processing QPF file {qpf}: {e}")
-
         print(f"    Deleting all QPE files newer than Imerg Latency Time: {imerg_Latency} because it might be duplicated files")
-        for qpedup in qpes:
-            try:
-                geotiff_datetime = get_geotiff_datetime(precipFolder + qpedup)
-                if geotiff_datetime > current_datetime - timedelta(hours=4):
-                    os.remove(precipFolder + qpedup)
-            except Exception as e:
-                print(f"Error processing QPE duplicate file {qpedup}: {e}")
+        print("    Deleting all QPF files older than Current Time: ", current_datetime)
+        print("    Moving all QPF files older than Current Time: ", current_datetime, " into qpf_store folder.")
+        # Single pass over the precip folder
+        with os.scandir(precipFolder) as entries:
+            for entry in entries:
+                if "qpe" in entry.name:
+                    try:
+                        geotiff_stamp = _file_stamp(entry.name)
+                        if geotiff_stamp < older_QPE_stamp or geotiff_stamp > imerg_Latency_stamp:
+                            os.remove(entry.path)
+                    except Exception as e:
+                        logger.warning(f"Error processing QPE file {entry.name}: {e}", exc_info=True)
+                elif "qpf" in entry.name:
+                    try:
+                        if _file_stamp(entry.name) < current_stamp:
+                            move_file(entry.path, os.path.join(qpf_store_path, entry.name))
+                        else:
+                            os.remove(entry.path)
+                    except Exception as e:
+                        logger.warning(f"Error processing QPF file {entry.name}: {e}", exc_info=True)
 
         print(f"    Deleting all QPF files in store folder older than: {imerg_Latency}")
-        qpf_stored_files = os.listdir(qpf_store_path)
-        qpf_stored_files = [f for f in qpf_stored_files if f.endswith('.tif')]
-        max_qpf = current_datetime - timedelta(hours=4)
-        for qpf_stored in qpf_stored_files:
+        for entry in iter_tifs(qpf_store_path):
             try:
-                qpf_datetime = get_geotiff_datetime(qpf_store_path + qpf_stored)
-                if qpf_datetime < max_qpf:
-                    os.remove(qpf_store_path + qpf_stored)
+                if _file_stamp(entry.name) < imerg_Latency_stamp:
+                    os.remove(entry.path)
             except Exception as e:
-                print(f"Error processing stored QPF file {qpf_stored}: {e}")
+                logger.warning(f"Error processing stored QPF file {entry.name}: {e}", exc_info=True)
     except Exception as e:
-        print(f"General error in cleanup_precip function: {e}")
-
-        
\ No newline at end of file
+        logger.error(f"General error in cleanup_precip function: {e}", exc_info=True)
@@ -1,11 +1,29 @@
-import datetime
-from datetime import datetime
 import os
-from datetime import timedelta
+from functools import lru_cache
+from datetime import datetime, timedelta
 
+def parse_stamp(stamp):
+    """Funtion that builds the datetime of a fixed width YYYYmmddHHMM or YYYYmmddHHMMSS stamp
+
+    Slicing the fixed width fields avoids the format string interpreter of datetime.strptime.
+
+    Arguments:
+        stamp {str} -- 12 or 14 digit timestamp
+
+    Returns:
+        datetime -- datetime object of the timestamp
+    """
+    if len(stamp) not in (12, 14) or not (stamp.isascii() and stamp.isdigit()):
+        raise ValueError(f"'{stamp}' is not a YYYYmmddHHMM[SS] timestamp")
+    return datetime(int(stamp[0:4]), int(stamp[4:6]), int(stamp[6:8]),
+                    int(stamp[8:10]), int(stamp[10:12]), int(stamp[12:14] or 0))
+
+@lru_cache(maxsize=4096)
 def get_geotiff_datetime(geotiff_path):
     """Funtion that extracts a datetime object corresponding to a Geotiff's timestamp
 
+    The timestamp only depends on the file name, so results are cached per path.
+
     Arguments:
         geotiff_path {str} -- path to the geotiff to extract a datetime from
 
@@ -14,20 +32,39 @@ def get_geotiff_datetime(geotiff_path):
     """
     geotiff_file = geotiff_path.split('/')[-1]
     geotiff_timestamp = geotiff_file.split('.')[2]
-    geotiff_datetime = datetime.strptime(geotiff_timestamp, '%Y%m%d%H%M')
+    geotiff_datetime = parse_stamp(geotiff_timestamp)
     return geotiff_datetime
 
+def get_geotiff_stamp(geotiff_path):
+    """Funtion that extracts the YYYYmmddHHMM timestamp string of a Geotiff without parsing it
+
+    Stamps of this fixed width sort like the datetimes they encode, so ages can be checked by
+    comparing against threshold.strftime('%Y%m%d%H%M').
+
+    Arguments:
+        geotiff_path {str} -- path to the geotiff to extract a timestamp from
+
+    Returns:
+        str -- 12 digit timestamp of the geotiff
+    """
+    geotiff_timestamp = os.path.basename(geotiff_path).split('.')[2]
+    if len(geotiff_timestamp) != 12 or not geotiff_timestamp.isdigit():
+        raise ValueError(f"'{geotiff_timestamp}' is not a YYYYmmddHHMM timestamp")
+    return geotiff_timestamp
+
+@lru_cache(maxsize=8192)
 def extract_timestamp(filename):
-    """ This function is used in get_gpm_files"""
+    """ This function is used in get_gpm_files. Parsing only depends on the name, so results are cached"""
     date_str = filename.split('.')[4][:8]  
     time_str = filename.split('-')[3][1:]  
     date_time_str = date_str + time_str
-    final_datetime = datetime.strptime(date_time_str, '%Y%m%d%H%M%S')+timedelta(minutes=30)
+    final_datetime = parse_stamp(date_time_str)+timedelta(minutes=30)
     return final_datetime
 
+@lru_cache(maxsize=8192)
 def extract_datetime_from_filename(filename):
     """ This function is used in get_gpm_files"""
     base_name = os.path.basename(filename)
     date_str = base_name.split('.')[2]  # Get YYYYMMDDHHMM part
-    filename = datetime.strptime(date_str, '%Y%m%d%H%M')
+    filename = parse_stamp(date_str)
     return filename
\ No newline at end of file
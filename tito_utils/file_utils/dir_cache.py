@@ -0,0 +1,53 @@
+import os
+import fnmatch
+
+class DirSnapshot:
+    """Snapshot of the files in a directory, read with a single os.scandir pass.
+
+    Lookups and pattern matches are answered from memory, so several of them cost one
+    directory read instead of one glob walk each. The snapshot does not follow later
+    changes to the directory; call refresh() after writing to it.
+
+    Arguments:
+        path {str} -- path of the directory to read
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the directory. A missing directory reads as empty."""
+        try:
+            with os.scandir(self.path) as entries:
+                self.entries = {entry.name: entry for entry in entries if entry.is_file()}
+        except FileNotFoundError:
+            self.entries = {}
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def match(self, pattern):
+        """Names of the files matching a glob style pattern
+
+        Arguments:
+            pattern {str} -- pattern such as "imerg.qpe.*.30minAccum.tif"
+
+        Returns:
+            list -- matching file names
+        """
+        return fnmatch.filter(self.entries, pattern)
+
+    def paths(self, pattern='*'):
+        """Full paths of the files matching a glob style pattern"""
+        return [self.entries[name].path for name in self.match(pattern)]
+
+    def stat(self, name):
+        """stat_result of a file, cached by os.DirEntry after the first call"""
+        return self.entries[name].stat()
@@ -0,0 +1,34 @@
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+def _copy_one(copy_function, src, dst):
+    try:
+        copy_function(src, dst)
+    except OSError as e:
+        return (src, dst, e)
+    return None
+
+def batch_copy(pairs, copy_function=shutil.copy2, max_workers=1):
+    """Function that copies a batch of files, collecting the failures instead of stopping.
+
+    shutil.copy2 already hands the data transfer to the kernel (sendfile) on Linux, so no
+    payload goes through Python buffers. With max_workers above 1 the copies are dispatched
+    to a thread pool, which overlaps their latency on slow or networked storage.
+
+    Arguments:
+        pairs {list} -- (source path, destination path) tuples to copy
+
+    Keyword Arguments:
+        copy_function {callable} -- function used to copy one file (default: {shutil.copy2})
+        max_workers {int} -- number of concurrent copies (default: {1})
+
+    Returns:
+        list -- (source path, destination path, exception) tuples for the copies that failed
+    """
+    pairs = list(pairs)
+    if max_workers > 1 and len(pairs) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pairs))) as executor:
+            results = list(executor.map(lambda pair: _copy_one(copy_function, *pair), pairs))
+    else:
+        results = [_copy_one(copy_function, src, dst) for src, dst in pairs]
+    return [result for result in results if result is not None]
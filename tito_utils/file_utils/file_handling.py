@@ -1,21 +1,38 @@
 import os
 import errno
+import shutil
 from os import makedirs
 
 def is_non_zero_file(fpath):
     """Function that checks if a file exists and is not empty
 
     Arguments:
-        fpath {str} -- file path to check
+        fpath {str or os.DirEntry} -- file path to check, or a scandir entry whose cached stat is used
 
     Returns:
         bool -- True or False
     """
+    if isinstance(fpath, os.DirEntry):
+        return fpath.is_file() and fpath.stat().st_size > 0
     if os.path.isfile(fpath) and os.path.getsize(fpath) > 0:
         return True
     else:
         return False
 
+def iter_tifs(path):
+    """Function that yields the .tif files of a folder, enumerated with a single os.scandir pass.
+
+    Arguments:
+        path {str} -- path of the folder to scan
+
+    Yields:
+        os.DirEntry -- entry of each .tif file, with .name, .path and a cached .stat()
+    """
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.endswith('.tif') and entry.is_file():
+                yield entry
+
 def mkdir_p(path):
     """Function that makes a new directory.
 
@@ -32,6 +49,45 @@ def mkdir_p(path):
         else:
             raise
 
+def link_or_copy(src, dst):
+    """Function that makes dst a hardlink of src, keeping src in place.
+
+    Falls back to a copy when the hardlink is not possible, e.g. across filesystems. An existing
+    dst is unlinked first, so neither path ever writes through a file shared by another link.
+
+    Arguments:
+        src {str} -- path of the file to link
+        dst {str} -- path of the new file
+    """
+    try:
+        os.remove(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def move_file(src, dst):
+    """Function that moves src to dst.
+
+    Renames the file when both paths are on the same filesystem and falls back to a copy
+    followed by a delete otherwise. When src and dst are already hardlinks to the same file
+    (os.replace does nothing then), src is simply unlinked.
+
+    Arguments:
+        src {str} -- path of the file to move
+        dst {str} -- destination path of the file
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        os.remove(src)
+        return
+    try:
+        os.replace(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+        os.remove(src)
+
 def newline(n=1):
     """Print n blank lines."""
     print("\n" * n, end="")
\ No newline at end of file
@@ -2,18 +2,28 @@ from .imerg_retrieve import (
     retrieve_imerg_files,
     get_gpm_files,
     get_file,
+    WarpToDomain,
     ReadandWarp,
+    CreateGrid,
     WriteGrid,
+    ScaleIMERG,
     processIMERG,
-    get_new_precip
+    processIMERGtoGrid,
+    get_new_precip,
+    prefetch_imerg_listings
 )
 
 __all__ = [
     'retrieve_imerg_files',
     'get_gpm_files',
     'get_file',
+    'WarpToDomain',
     'ReadandWarp',
+    'CreateGrid',
     'WriteGrid',
+    'ScaleIMERG',
     'processIMERG',
-    'get_new_precip'
+    'processIMERGtoGrid',
+    'get_new_precip',
+    'prefetch_imerg_listings'
 ]
\ No newline at end of file
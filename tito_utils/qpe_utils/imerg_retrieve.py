@@ -1,20 +1,39 @@
 import requests               
-from bs4 import BeautifulSoup  
 import os
-import glob
-import shutil
-import subprocess
-import requests
-from bs4 import BeautifulSoup
-import datetime
-from datetime import datetime as dt
-from datetime import timedelta
-from os import makedirs, listdir, rename, remove
+import logging
+import re
+import math
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta
+from multiprocessing.pool import ThreadPool
+from functools import lru_cache
 import numpy as np
 import osgeo.gdal as gdal
-from osgeo.gdal import gdalconst
 from osgeo.gdalconst import GA_ReadOnly
-from tito_utils.file_utils.datetime_utils import extract_timestamp, extract_datetime_from_filename
+from tito_utils.file_utils.datetime_utils import parse_stamp, extract_timestamp, extract_datetime_from_filename
+from tito_utils.file_utils.file_handling import link_or_copy
+from tito_utils.file_utils.fast_copy import batch_copy
+from tito_utils.file_utils.dir_cache import DirSnapshot
+
+logger = logging.getLogger(__name__)
+
+# One session for the listings and downloads, so the TLS connections to the GPM server are reused
+# Requests time out after 60 s of silence so a stalled connection cannot hang a download worker
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=3))
+
+# Links to the 30 min files in the server's directory index
+_HREF_RE = re.compile(rb'href=["\']([^"\']+30min\.tif)["\']')
+
+# Fixed time offsets of the IMERG half-hour grid and of the nowcast window, built once
+_TD_29M = timedelta(minutes=29)
+_TD_30M = timedelta(minutes=30)
+_TD_60M = timedelta(minutes=60)
+_TD_3H30 = timedelta(hours=3.5)
+_TD_9H30 = timedelta(hours=9.5)
+
+# YYYYmmddHHMM stamp in the name of a stored nowcast
+_STORE_STAMP_RE = re.compile(r'\.(\d{12})\.')
 
 def retrieve_imerg_files(url, email_gpm, HindCastMode, date):
     if HindCastMode:
@@ -25,104 +44,175 @@ def retrieve_imerg_files(url, email_gpm, HindCastMode, date):
         url_server = url + '/' + folder
         
     # Send a GET request to the URL
-    response = requests.get(url_server, auth=(email_gpm, email_gpm))
+    response = _session.get(url_server, auth=(email_gpm, email_gpm), timeout=60)
 
     # Check if the request was successful
     if response.status_code == 200:
-        # Parse the content of the response with BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Find all links on the page
-        links = soup.find_all('a')
-
-        # Extract file names from the links
-        files = [link.get('href') for link in links if link.get('href').endswith('30min.tif')]
+        # Extract the file names from the links of the index page
+        files = [href.decode() for href in _HREF_RE.findall(response.content)]
     else:
         print(f"Failed to retrieve the directory listing. Status code: {response.status_code}")
         
     return files 
 
 
+@lru_cache(maxsize=4)
+def _imerg_server_timestamps(url, email_gpm, HindCastMode, year, month, cycle):
+    """Timestamps of the IMERG files listed in a month folder of the server, cached per folder so
+    the listing is downloaded and parsed once instead of once per missing date.
+    cycle is the current_timestamp of the run; it is part of the cache key so every cycle lists the
+    server again and new half-hour files are never missed by a long-running process."""
+    server_files = retrieve_imerg_files(url, email_gpm, HindCastMode, datetime(year, month, 1))
+    return frozenset(extract_timestamp(file) for file in server_files)
+
+
+def prefetch_imerg_listings(url, email_gpm, HindCastMode, current_timestamp):
+    """Download the server listings get_new_precip will look up for current_timestamp into the
+    listing cache. Only reads the server, so it can run while the local folders are cleaned up.
+    Failures are logged and left for get_new_precip to hit again and report."""
+    months = {(date.year, date.month) for date in (current_timestamp - _TD_9H30, current_timestamp - _TD_3H30)}
+    for year, month in months:
+        try:
+            _imerg_server_timestamps(url, email_gpm, HindCastMode, year, month, current_timestamp)
+        except Exception:
+            logger.warning(f"Could not prefetch the IMERG listing for {year}/{month:02d}", exc_info=True)
+
+
+def _halfhour_range(start, stop):
+    """Half hourly timestamps strictly between start and stop."""
+    n = max(0, math.ceil((stop - start) / _TD_30M) - 1)
+    return [start + _TD_30M*(i+1) for i in range(n)]
+
+
+def _qpf_store_index(qpf_store_path):
+    """Map each timestamp in the qpf store to the names of the files holding it, from a single scan"""
+    store_index = {}
+    try:
+        with os.scandir(qpf_store_path) as entries:
+            for entry in entries:
+                match = _STORE_STAMP_RE.search(entry.name)
+                if match:
+                    store_index.setdefault(match.group(1), []).append(entry.name)
+    except FileNotFoundError:
+        pass
+    return store_index
+
+def _copy_from_store(dates, store_index, qpf_store_path, precipFolder):
+    """Copy the stored nowcasts of the dates missing on the IMERG server into the precip folder, concurrently"""
+    filenames = [filename for date in dates for filename in store_index.get(date.strftime('%Y%m%d%H%M'), ())]
+    copies = [(os.path.join(qpf_store_path, filename), os.path.join(precipFolder, filename)) for filename in filenames]
+    failed = {src for src, dst, e in batch_copy(copies, copy_function=link_or_copy, max_workers=8)}
+    for (src, dst), filename in zip(copies, filenames):
+        if src in failed:
+            print(f"    File '{filename}' could not be copied in '{precipFolder}'")
+        else:
+            print(f"    File '{filename}' was copied in '{precipFolder}'")
+
 def get_gpm_files(precipFolder, initial_timestamp, final_timestamp, ppt_server_path, email_gpm, xmin, ymin, xmax, ymax):
     #path server
     server = ppt_server_path
     file_prefix = '3B-HHR-E.MS.MRG.3IMERG.'
     file_suffix = '.V07B.30min.tif'
     
-    final_date = final_timestamp + timedelta(minutes=30)
-    delta_time = datetime.timedelta(minutes=30)
+    final_date = final_timestamp + _TD_30M
+    delta_time = _TD_30M
     
-    # Loop through dates
+    # List every timestep up front so the downloads can run concurrently
+    tasks = []
     current_date = initial_timestamp
-    #acumulador_30M = 0
-    
     while (current_date < final_date):
         initial_time_stmp = current_date.strftime('%Y%m%d-S%H%M%S')
-        final_time = current_date + timedelta(minutes=29)
+        final_time = current_date + _TD_29M
         final_time_stmp = final_time.strftime('E%H%M59')
-        final_time_gridout = current_date + timedelta(minutes=30)
+        final_time_gridout = current_date + _TD_30M
         folder = current_date.strftime('%Y/%m/')
         
-        # #finding accum
-        hours = (current_date.hour)
-        minutes = (current_date.minute)
-    
         # # Calculate the number of minutes since the beginning of the day.
-        total_minutes = hours * 60 + minutes
+        total_minutes = current_date.hour * 60 + current_date.minute
     
         date_stamp = initial_time_stmp + '-' + final_time_stmp + '.' + f"{total_minutes:04}"
 
         filename = folder + file_prefix + date_stamp + file_suffix
+        # Filename has final datestamp as it represents the accumulation upto that point in time
+        gridOutName = precipFolder+'imerg.qpe.' + final_time_gridout.strftime('%Y%m%d%H%M') + '.30minAccum.tif'
+        tasks.append((filename, gridOutName, final_time_gridout))
 
+        # Advance in time
+        current_date = current_date + delta_time
+
+    if not tasks:
+        return
+
+    def fetch_one(task):
+        filename, gridOutName, final_time_gridout = task
         print('    Downloading ' + final_time_gridout.strftime('%Y-%m-%d %H:%M'))
         try:
-            # Download from NASA server
-            get_file(filename,server, email_gpm)
-            # Process file for domain and to fit EF5
-            # Filename has final datestamp as it represents the accumulation upto that point in time
-            gridOutName = precipFolder+'imerg.qpe.' + final_time_gridout.strftime('%Y%m%d%H%M') + '.30minAccum.tif'
-            local_filename = file_prefix + date_stamp + file_suffix
-            NewGrid, nx, ny, gt, proj = processIMERG(local_filename, xmin, ymin, xmax, ymax)
-            filerm = file_prefix + date_stamp + file_suffix
-            # Write out processed filename
-            WriteGrid(gridOutName, NewGrid, nx, ny, gt, proj)
-            os.remove(filerm)
+            # Download from NASA server into GDAL's in-memory filesystem
+            mem_filename = get_file(filename,server, email_gpm)
+            # Process file for domain and to fit EF5, and write out processed filename
+            try:
+                processIMERGtoGrid(mem_filename, gridOutName, xmin, ymin, xmax, ymax)
+            finally:
+                gdal.Unlink(mem_filename)
         except Exception as e:
             print(e)
             print(filename)
-            pass
 
-        # Advance in time
-        current_date = current_date + delta_time
+    # Downloads are I/O bound, so a few concurrent connections cut the backfill wall time
+    tp = ThreadPool(min(8, len(tasks)))
+    for _ in tp.imap_unordered(fetch_one, tasks):
+        pass
+    tp.close()
+    tp.join()
 
 
 def get_file(filename,server, email_gpm):
-   ''' Get the given file from jsimpsonhttps using curl. '''
+   ''' Get the given file from jsimpsonhttps, streamed into /vsimem/. Returns the in-memory path,
+   to be released with gdal.Unlink once read. '''
    url = server + '/' + filename
-   cmd = 'curl -sO -u ' + email_gpm + ':' + email_gpm + ' ' + url
-   args = cmd.split()
-   process = subprocess.Popen(args, stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-   process.wait() # wait so this program doesn't end before getting all files#
+   response = _session.get(url, auth=(email_gpm, email_gpm), stream=True, timeout=60)
+   response.raise_for_status()
+   mem_filename = '/vsimem/' + os.path.basename(filename)
+   mem_file = gdal.VSIFOpenL(mem_filename, 'wb')
+   try:
+      for chunk in response.iter_content(chunk_size=1024*1024):
+         gdal.VSIFWriteL(chunk, 1, len(chunk), mem_file)
+   finally:
+      gdal.VSIFCloseL(mem_file)
+      response.close()
+   return mem_filename
 
 
-def ReadandWarp(gridFile, xmin, ymin, xmax, ymax):
+def WarpToDomain(gridFile, xmin, ymin, xmax, ymax):
 
-    #Read grid and warp to domain grid
+    #Georeference, clip and warp the grid to the domain grid as a chain of VRTs
+    #Nothing is computed until the warped dataset is read, one block at a time if needed
+    #The intermediate datasets are returned too and must be kept alive while reading
     #Assumes no reprojection is necessary, and EPSG:4326
     rawGridIn = gdal.Open(gridFile, GA_ReadOnly)
 
-    # Adjust grid
-    pre_ds = gdal.Translate('OutTemp.tif', rawGridIn, options="-co COMPRESS=Deflate -a_nodata 29999 -a_ullr -180.0 90.0 180.0 -90.0")
+    # Adjust grid, as a VRT so nothing is written to disk
+    pre_ds = gdal.Translate('', rawGridIn, format='VRT', noData=29999, outputBounds=[-180.0, 90.0, 180.0, -90.0])
 
     gt = pre_ds.GetGeoTransform()
-    proj = pre_ds.GetProjection()
-    nx = pre_ds.GetRasterBand(1).XSize
-    ny = pre_ds.GetRasterBand(1).YSize
     NoData = 29999
     pixel_size = gt[1]
 
+    # Clip the global grid to the domain plus a one pixel margin first, so the warp only reads
+    # and resamples the source blocks that intersect the domain
+    clip_ds = gdal.Translate('', pre_ds, format='VRT', projWin=[xmin - pixel_size, ymax + pixel_size, xmax + pixel_size, ymin - pixel_size])
+
     #Warp to model resolution and domain extents
-    ds = gdal.Warp('', pre_ds, srcNodata=NoData, srcSRS='EPSG:4326', dstSRS='EPSG:4326', dstNodata='29999', format='VRT', xRes=pixel_size, yRes=-pixel_size, outputBounds=(xmin,ymin,xmax,ymax))
+    ds = gdal.Warp('', clip_ds, srcNodata=NoData, srcSRS='EPSG:4326', dstSRS='EPSG:4326', dstNodata='29999', format='VRT', outputType=gdal.GDT_Float32, xRes=pixel_size, yRes=-pixel_size, outputBounds=(xmin,ymin,xmax,ymax),
+                   multithread=True, warpOptions=['NUM_THREADS=ALL_CPUS'], warpMemoryLimit=512*1024*1024)
+
+    return ds, (rawGridIn, pre_ds, clip_ds)
+
+
+def ReadandWarp(gridFile, xmin, ymin, xmax, ymax):
+
+    #Read grid and warp to domain grid
+    ds, sources = WarpToDomain(gridFile, xmin, ymin, xmax, ymax)
 
     WarpedGrid = ds.ReadAsArray()
     new_gt = ds.GetGeoTransform()
@@ -133,25 +223,53 @@ def ReadandWarp(gridFile, xmin, ymin, xmax, ymax):
     return WarpedGrid, new_nx, new_ny, new_gt, new_proj
 
 
-def WriteGrid(gridOutName, dataOut, nx, ny, gt, proj):
-    #Writes out a GeoTIFF based on georeference information in RefInfo
+def CreateGrid(gridOutName, nx, ny, gt, proj):
+    #Creates an empty GeoTIFF based on georeference information in RefInfo
     driver = gdal.GetDriverByName('GTiff')
-    dst_ds = driver.Create(gridOutName, nx, ny, 1, gdal.GDT_Float32, ['COMPRESS=DEFLATE'])
+    # Tiled float32 with the floating point predictor compresses much better, on all cores
+    dst_ds = driver.Create(gridOutName, nx, ny, 1, gdal.GDT_Float32, ['COMPRESS=DEFLATE', 'PREDICTOR=3', 'ZLEVEL=1', 'TILED=YES',
+                                                                    'BLOCKXSIZE=256', 'BLOCKYSIZE=256', 'NUM_THREADS=ALL_CPUS'])
     dst_ds.SetGeoTransform(gt)
     dst_ds.SetProjection(proj)
-    dataOut.shape = (-1, nx)
-    dst_ds.GetRasterBand(1).WriteArray(dataOut, 0, 0)
     dst_ds.GetRasterBand(1).SetNoDataValue(-9999.0)
+    return dst_ds
+
+
+def WriteGrid(gridOutName, dataOut, nx, ny, gt, proj):
+    #Writes out a GeoTIFF based on georeference information in RefInfo
+    dst_ds = CreateGrid(gridOutName, nx, ny, gt, proj)
+    assert dataOut.shape == (ny, nx), f"grid of shape {dataOut.shape} does not match {ny}x{nx}"
+    dst_ds.GetRasterBand(1).WriteArray(dataOut, 0, 0)
     dst_ds = None
 
+def ScaleIMERG(grid):
+    # Scale value in place on the float32 grid, keeping nodata pixels out of the scaling
+    nodata = grid == 29999
+    np.multiply(grid, np.float32(0.1), out=grid)
+    grid[nodata] = -9999.0
+
 def processIMERG(local_filename,llx, lly ,urx, ury):
     # Process grid
     # Read and subset grid
     NewGrid, nx, ny, gt, proj = ReadandWarp(local_filename,llx, lly, urx, ury)
-    # Scale value
-    NewGrid = NewGrid*0.1
+    ScaleIMERG(NewGrid)
     return NewGrid, nx, ny, gt, proj
 
+def processIMERGtoGrid(local_filename, gridOutName, llx, lly, urx, ury, block_rows=256):
+    # Process grid and write it out block by block, so only block_rows rows of the
+    # warped grid are in memory at any time
+    ds, sources = WarpToDomain(local_filename, llx, lly, urx, ury)
+    nx = ds.RasterXSize
+    ny = ds.RasterYSize
+    dst_ds = CreateGrid(gridOutName, nx, ny, ds.GetGeoTransform(), ds.GetProjection())
+    src_band = ds.GetRasterBand(1)
+    dst_band = dst_ds.GetRasterBand(1)
+    for yoff in range(0, ny, block_rows):
+        block = src_band.ReadAsArray(0, yoff, nx, min(block_rows, ny - yoff))
+        ScaleIMERG(block)
+        dst_band.WriteArray(block, 0, yoff)
+    dst_ds = None
+
 def get_new_precip(current_timestamp, ppt_server_path, precipFolder, email, HindCastMode, qpf_store_path, xmin, ymin, xmax, ymax):
     """Function that brings latest IMERG precipitation file into the GeoTIFF precip folder
 
@@ -167,145 +285,109 @@ def get_new_precip(current_timestamp, ppt_server_path, precipFolder, email, Hind
     """
     #Look for the most recent file in precip folder
     #Obtainign the latest time step in the folder
-    files_folder = os.listdir(precipFolder)
-    tif_files = [f for f in files_folder if "qpe" in f]
+    with os.scandir(precipFolder) as entries:
+        tif_files = [entry.name for entry in entries if "qpe" in entry.name]
     
+    # Stored nowcasts by timestamp, to fill the dates missing on the IMERG server
+    store_index = _qpf_store_index(qpf_store_path)
+    # Dates that have to be filled from the qpf store, copied together at the end
+    store_dates = []
+
     #the first hour of nowcast files will be current time - 3.5h
-    nowcast_older = current_timestamp - timedelta(hours = 3.5) #This is the first nowcast file to be created 
+    nowcast_older = current_timestamp - _TD_3H30 #This is the first nowcast file to be created 
     
     if tif_files:
         print("    There are IMERG files in the precip folder")
         # Extract the most recent date from files
-        latest_date = max(tif_files, key=lambda x: datetime.datetime.strptime(x[10:22], '%Y%m%d%H%M')) #to improve 
-        formatted_latest_pptfile = datetime.datetime.strptime(latest_date[10:22], '%Y%m%d%H%M') #last file on imerg precip
+        # Parse each filename once and keep the most recent date
+        formatted_latest_pptfile = max(parse_stamp(f[10:22]) for f in tif_files) #last file on imerg precip
         #if the latest imerg file in folder corresponds to the older nowcast file (current time - 4h)
         if formatted_latest_pptfile < nowcast_older:
             # and if the time difference betwen the current timestep and the latest imerg in folder is less than 30 min.
-            if nowcast_older - formatted_latest_pptfile <= timedelta(minutes=60):
-                print(f"    There are less than 60 min between last imerg file available on folder: {formatted_latest_pptfile} and last imerg file on server: ", nowcast_older-timedelta(minutes=30))
+            if nowcast_older - formatted_latest_pptfile <= _TD_60M:
+                print(f"    There are less than 60 min between last imerg file available on folder: {formatted_latest_pptfile} and last imerg file on server: ", nowcast_older-_TD_30M)
                 #List the missing dates between lastest ppt file and current timestep -4h
-                missing_dates = []
                 # Iterar desde la fecha del archivo más reciente hasta el timestamp actual en intervalos de 30 minutos
-                next_timestamp = formatted_latest_pptfile + timedelta(minutes=30)
-                while next_timestamp < nowcast_older:
-                    missing_dates.append(next_timestamp)
-                    next_timestamp += timedelta(minutes=30)
+                missing_dates = _halfhour_range(formatted_latest_pptfile, nowcast_older)
                 for date in missing_dates:
                     #Verifying if missing dates are on the GPM server.
-                    server_files = retrieve_imerg_files(ppt_server_path, email, HindCastMode, date)
-                    timestamps = [extract_timestamp(file) for file in server_files]
+                    timestamps = _imerg_server_timestamps(ppt_server_path, email, HindCastMode, date.year, date.month, current_timestamp)
                     if date in timestamps:
                         print("    Downloading the last file of precip data")
                         #downloading the file 
-                        date_server = date - timedelta(minutes=30)
-                        nowcast_older_server = nowcast_older - timedelta(minutes=60) #this is because get imerg files sums up 30 min
+                        date_server = date - _TD_30M
+                        nowcast_older_server = nowcast_older - _TD_60M #this is because get imerg files sums up 30 min
                         get_gpm_files(precipFolder, date_server, nowcast_older_server, ppt_server_path, email, xmin, ymin, xmax, ymax)
                     else:
                         print("    The file required is not available on the IMERG server.")
                         print("    Copying the corresponding file from nowcast store folder")
-                        formatted_date = date.strftime('%Y%m%d%H%M')
-                        # Look for the filename in qpf store that cointains the 'formatted_timestamp' missing
-                        for filename in os.listdir(qpf_store_path):
-                            if formatted_date in filename:
-                                source_file = os.path.join(qpf_store_path, filename)
-                                destination_file = os.path.join(precipFolder, filename)
-                                # Copiar el archivo al directorio de destino
-                                shutil.copy2(source_file, destination_file)
-                                print(f"    File '{filename}' was copied in '{precipFolder}'")
-                            else:   
-                                break                          
+                        # Look for the files in qpf store that contain the missing timestamp
+                        store_dates.append(date)
             else: 
-                print(f"    There's more than a 60 min gap between latency Imerg: {nowcast_older-timedelta(minutes=30)} and the latest geoTIFF file {formatted_latest_pptfile}")
+                print(f"    There's more than a 60 min gap between latency Imerg: {nowcast_older-_TD_30M} and the latest geoTIFF file {formatted_latest_pptfile}")
                 print("    Latest Geotiff file available in folder:", formatted_latest_pptfile)
-                print("    Last IMERG file to download:", nowcast_older - timedelta(minutes=30))
+                print("    Last IMERG file to download:", nowcast_older - _TD_30M)
                 #Downloading imerg files between dates
-                nowcast_older_server = nowcast_older - timedelta(minutes=60)
+                nowcast_older_server = nowcast_older - _TD_60M
                 latest_pptfile = formatted_latest_pptfile
                 get_gpm_files(precipFolder, latest_pptfile, nowcast_older_server, ppt_server_path, email, xmin, ymin, xmax, ymax)
                 
                 #List the missing dates between latest ppt file and current timestep
-                missing_dates = []
-                next_timestamp = formatted_latest_pptfile + timedelta(minutes=30)
-                while next_timestamp < nowcast_older:
-                    missing_dates.append(next_timestamp)
-                    next_timestamp += timedelta(minutes=30)
+                missing_dates = _halfhour_range(formatted_latest_pptfile, nowcast_older)
                
                 for date in missing_dates: 
                     #retrieven file names from GPM server
-                    server_files = retrieve_imerg_files(ppt_server_path, email, HindCastMode, date)    
-                    timestamps = [extract_timestamp(file) for file in server_files]
+                    timestamps = _imerg_server_timestamps(ppt_server_path, email, HindCastMode, date.year, date.month, current_timestamp)
                     
                     #Looking for timestaps missing in imerg
                     if date not in timestamps:
                         print(f"    File {date} is missing")
                         print("    Copying the corresponding file from nowcast store folder")
-                        formatted_date = date.strftime('%Y%m%d%H%M')
                         # Copying missing file from qpf store folder 
-                        for filename in os.listdir(qpf_store_path):
-                            if formatted_date in filename:
-                                source_file = os.path.join(qpf_store_path, filename)
-                                destination_file = os.path.join(precipFolder, filename)
-                                # Copying file to precip folder
-                                shutil.copy2(source_file, destination_file)
-                                print(f"    File '{filename}' was copied in '{precipFolder}'")
-                            else:
-                                break
+                        store_dates.append(date)
                     #if date is in timestaps, file is available.    
     else:
         print("    No '.tif' files found in the precip folder.") 
         #If there is no files in folder, Download the entire chuck of dates 
         #from failtime (current time - 6h) to Nowcast time (current time -4h) 
-        initial_time = current_timestamp - timedelta(hours = 9.5)
+        initial_time = current_timestamp - _TD_9H30
         #Downloading imerg Files
-        nowcast_older_server = nowcast_older - timedelta(minutes=60)
-        initial_time_server = initial_time - timedelta(minutes=30)
-        print("    Last IMERG file to download:", nowcast_older- timedelta(minutes=30))
+        nowcast_older_server = nowcast_older - _TD_60M
+        initial_time_server = initial_time - _TD_30M
+        print("    Last IMERG file to download:", nowcast_older- _TD_30M)
         print("    Initial time to download:", initial_time)
         get_gpm_files(precipFolder, initial_time_server, nowcast_older_server, ppt_server_path, email, xmin, ymin, xmax, ymax)
         #if some file is missing
-        missing_dates = []
-        next_timestamp = initial_time + timedelta(minutes=30)
+        missing_dates = _halfhour_range(initial_time, nowcast_older)
 
         #retrieving gpm files for the last file that it is supposed to be downloaded.
-        date_in_server = nowcast_older- timedelta(minutes=30)
-        server_files = retrieve_imerg_files(ppt_server_path, email, HindCastMode, date_in_server)
-
-        while next_timestamp < nowcast_older:
-            missing_dates.append(next_timestamp)
-            next_timestamp += timedelta(minutes=30)
-            
-            for date in missing_dates:     
-                timestamps = [extract_timestamp(file) for file in server_files]
-                
-                if date not in timestamps:
-                    print(f"    File {date} is missing")
-                    print("    Copying the corresponding file from nowcast store folder")
-                    formatted_date = date.strftime('%Y%m%d%H%M')
-                    for filename in os.listdir(qpf_store_path):
-                        if formatted_date in filename:
-                            source_file = os.path.join(qpf_store_path, filename)
-                            destination_file = os.path.join(precipFolder, filename)
-                            # Copying file to precip folder
-                            shutil.copy2(source_file, destination_file)
-                            print(f"    File '{filename}' was copied in '{precipFolder}'")
-                        else:
-                            break
-                    """
-                    print(f"   There is no file in qpf store with date: '{formatted_date}'") ### TO DO
-                    tif_files = glob.glob(os.path.join(precipFolder, "imerg.qpe.*.30minAccum.tif"))
-                    if tif_files:
-                        # Find the most recent file
-                        latest_file = max(tif_files, key=extract_datetime_from_filename)
-                        print(f"    Latest file: {latest_file}")
-                        new_filename = os.path.join(precipFolder, f"imerg.qpe.{formatted_date}.30minAccum.tif")
-                        shutil.copy2(latest_file, new_filename)
-                        print(f"    Created duplicate file: {new_filename}")
-                    else:
-                        print("    No .tif files found in precipFolder to copy")   
-                    """
+        date_in_server = nowcast_older- _TD_30M
+        timestamps = _imerg_server_timestamps(ppt_server_path, email, HindCastMode, date_in_server.year, date_in_server.month, current_timestamp)
+
+        for date in missing_dates:     
+            if date not in timestamps:
+                print(f"    File {date} is missing")
+                print("    Copying the corresponding file from nowcast store folder")
+                store_dates.append(date)
+                """
+                print(f"   There is no file in qpf store with date: '{formatted_date}'") ### TO DO
+                tif_files = glob.glob(os.path.join(precipFolder, "imerg.qpe.*.30minAccum.tif"))
+                if tif_files:
+                    # Find the most recent file
+                    latest_file = max(tif_files, key=extract_datetime_from_filename)
+                    print(f"    Latest file: {latest_file}")
+                    new_filename = os.path.join(precipFolder, f"imerg.qpe.{formatted_date}.30minAccum.tif")
+                    shutil.copy2(latest_file, new_filename)
+                    print(f"    Created duplicate file: {new_filename}")
+                else:
+                    print("    No .tif files found in precipFolder to copy")   
+                """
+    # Fill the dates missing on the IMERG server from the qpf store in one concurrent batch
+    _copy_from_store(store_dates, store_index, qpf_store_path, precipFolder)
+
     # Get a list of all .tif files in the current directory and delete this files
     try:
-        tif_files = glob.glob("./*.tif")
+        tif_files = DirSnapshot(".").paths("*.tif")
         for tif_file in tif_files:
             os.remove(tif_file)
     except:
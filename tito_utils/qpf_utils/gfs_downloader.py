@@ -11,8 +11,9 @@ Key details:
 - Uses Herbie to select the best available source for GFS pgrb2.0p25 files.
 - Fetches PRATE (precipitation rate) from GFS.
 - Converts PRATE (kg m-2 s-1) to hourly precipitation rate (mm/hour) by multiplying by 3600.
-- Writes EPSG:4326 GeoTIFFs using rioxarray, clipped to the provided bbox.
+- Writes EPSG:4326 GeoTIFFs with rasterio, clipped to the provided bbox.
 - File naming: gfs.YYYYMMDDHHMM.tif (valid time in UTC).
+- With single_file=True: one gfs.YYYYMMDDHHMM.bands.tif (init time) holding a band per forecast hour.
 
 Notes:
 - GFS 0.25° files generally provide hourly output to +120 h and 3-hourly beyond that.
@@ -21,13 +22,27 @@ Notes:
 
 from __future__ import annotations
 
+import hashlib
+import math
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Iterable, List, Optional, Tuple, Union
 
 import numpy as np
+import requests
 import xarray as xr
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import rasterio
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.transform import Affine
 
 # rioxarray import registers the rio accessor on xarray objects
 import rioxarray  # noqa: F401
@@ -39,6 +54,24 @@ except Exception as exc:  # pragma: no cover - provide a clearer import error
         "Herbie is required. Install with `pip install herbie-data`"
     ) from exc
 
+# Output grid metadata shared by every GeoTIFF written
+_WGS84 = CRS.from_epsg(4326)
+_NODATA = -9999.0
+_GFS_RES = 0.25
+_OVERVIEW_FACTORS = (2, 4, 8, 16)
+# Dimension names of the cfgrib GFS grids
+_GRIB_LATLON_DIMS = frozenset(("latitude", "longitude"))
+# Accepted spellings of the latitude/longitude dims of other grids
+_LAT_NAMES = frozenset(("latitude", "lat", "y"))
+_LON_NAMES = frozenset(("longitude", "lon", "x"))
+# Herbie search strings for PRATE, most specific first, and the last one that returned data
+_PRATE_QUERIES = (":PRATE:surface", ":PRATE:", "PRATE:surface", "PRATE")
+_winning_query: Optional[str] = None
+# Hours after which a cached clipped grid is refetched and deleted
+_CACHE_TTL_HOURS = 24.0
+# Per-thread state of the download workers: pooled HTTP session and reusable grid buffers
+_thread_local = threading.local()
+
 
 def _ensure_datetime(dt_like: Union[str, datetime]) -> datetime:
     """Convert a string or datetime-like to a Python datetime (naive, UTC-assumed).
@@ -54,6 +87,23 @@ def _ensure_datetime(dt_like: Union[str, datetime]) -> datetime:
         return dt_like
 
     s = str(dt_like).strip()
+
+    # Fast path: slice the fixed-width forms directly instead of trying each format
+    n = len(s)
+    if (
+        n in (10, 13, 16)
+        and s[4] == "-"
+        and s[7] == "-"
+        and (n == 10 or s[10] in (" ", "T"))
+        and (n != 16 or s[13] == ":")
+    ):
+        digits = (s[:4], s[5:7], s[8:10], s[11:13], s[14:16])[: {10: 3, 13: 4, 16: 5}[n]]
+        if all(part.isdigit() for part in digits):
+            try:
+                return datetime(*(int(part) for part in digits))
+            except ValueError:
+                pass  # out-of-range field; let the loop below report it
+
     for fmt in (
         "%Y-%m-%d %H",
         "%Y-%m-%dT%H",
@@ -123,24 +173,16 @@ def _standardize_latlon(var_da: xr.DataArray) -> xr.DataArray:
     """
     da = var_da.squeeze(drop=True)
 
+    # Fast path: GFS pgrb2.0p25 from cfgrib always comes with latitude/longitude dims
+    if _GRIB_LATLON_DIMS.issubset(da.dims):
+        da = da.rename({"latitude": "lat", "longitude": "lon"})
+        da = da.rio.write_crs(_WGS84, inplace=False)
+        return da.rio.set_spatial_dims(x_dim="lon", y_dim="lat", inplace=False)
+
     # Identify latitude/longitude dims
-    dims = list(da.dims)
-    lat_dim = None
-    lon_dim = None
-    for d in dims:
-        dl = d.lower()
-        if lat_dim is None and (dl == "latitude" or dl == "lat" or dl.endswith("_lat")):
-            lat_dim = d
-        if lon_dim is None and (dl == "longitude" or dl == "lon" or dl.endswith("_lon")):
-            lon_dim = d
-
-    # If dims are generic y/x, try to map via coordinates
-    if lat_dim is None or lon_dim is None:
-        for d in dims:
-            if d.lower() in ("y",):
-                lat_dim = d
-            if d.lower() in ("x",):
-                lon_dim = d
+    dims = da.dims
+    lat_dim = next((d for d in dims if d.lower() in _LAT_NAMES), None)
+    lon_dim = next((d for d in dims if d.lower() in _LON_NAMES), None)
 
     # Rename dims to lat/lon
     rename_map = {}
@@ -171,7 +213,7 @@ def _standardize_latlon(var_da: xr.DataArray) -> xr.DataArray:
             da = da.assign_coords(lon=np.arange(da.sizes["lon"]))
 
     # Register spatial metadata for rioxarray
-    da = da.rio.write_crs("EPSG:4326", inplace=False)
+    da = da.rio.write_crs(_WGS84, inplace=False)
     da = da.rio.set_spatial_dims(x_dim="lon", y_dim="lat", inplace=False)
 
     return da
@@ -185,31 +227,437 @@ def _wrap_longitudes_to_180(da: xr.DataArray) -> xr.DataArray:
     # Only wrap if values exceed 180 (i.e., 0..360 grid)
     if np.nanmax(lon_vals) <= 180 and np.nanmin(lon_vals) >= -180:
         return da
-    lon_wrapped = ((lon_vals + 180.0) % 360.0) - 180.0
-    da = da.assign_coords(lon=("lon", lon_wrapped))
-    da = da.sortby("lon")
+    lon_wrapped = np.mod(lon_vals + 180.0, 360.0) - 180.0
+    # Reorder with one precomputed permutation instead of xarray's general sortby
+    perm = np.argsort(lon_wrapped, kind="stable")
+    da = da.isel(lon=perm)
+    da = da.assign_coords(lon=("lon", lon_wrapped[perm]))
     return da
 
 
 
 
-def _safe_to_raster(da: xr.DataArray, out_path: str) -> None:
-    """Write DataArray to GeoTIFF with sensible defaults for EF5 compatibility."""
+def _grid_transform(lat: np.ndarray, lon: np.ndarray) -> Affine:
+    """Affine transform of a regular lat/lon grid from its cell-center coordinates.
+
+    The sign of each resolution follows the coordinate order, as rioxarray derives it, so
+    north-up (descending lat) grids get a negative y resolution. Single-cell axes fall back
+    to the 0.25° GFS spacing.
+    """
+    res_x = float(lon[1] - lon[0]) if lon.size > 1 else _GFS_RES
+    res_y = float(lat[1] - lat[0]) if lat.size > 1 else -_GFS_RES
+    return Affine(res_x, 0.0, float(lon[0]) - res_x / 2.0, 0.0, res_y, float(lat[0]) - res_y / 2.0)
+
+
+def _bbox_slice(coords: np.ndarray, lo: float, hi: float) -> Optional[slice]:
+    """Index slice of the cells of a regular coordinate axis that overlap [lo, hi].
+
+    Reproduces the window rioxarray's clip_box takes (cell edges at half a step from the
+    centers, floor/ceil to whole cells) for ascending or descending axes, using index
+    arithmetic only. Returns None when fewer than two cells remain, where clip_box fails.
+    """
+    n = coords.size
+    if n < 2:
+        return None
+    res = float(coords[1] - coords[0])
+    edge = float(coords[0]) - res / 2.0
+    first, last = (lo, hi) if res > 0 else (hi, lo)
+    start = min(n, max(0, math.floor((first - edge) / res)))
+    stop = min(n, max(0, math.ceil((last - edge) / res)))
+    if stop - start <= 1:
+        return None
+    return slice(start, stop)
+
+
+def _mm_per_hour(rate: np.ndarray) -> np.ndarray:
+    """Convert a PRATE grid (kg m-2 s-1 == mm/s) to float32 mm/hour with NaNs set to nodata.
+
+    Every forecast hour of a run clips to the same window, so the result and NaN mask are
+    written into float32/bool buffers kept per thread and reused across hours. The returned
+    array is only valid until the same thread converts its next hour.
+    """
+    buffers = getattr(_thread_local, "mm_buffers", None)
+    if buffers is None or buffers[0].shape != rate.shape:
+        buffers = (np.empty(rate.shape, dtype=np.float32), np.empty(rate.shape, dtype=bool))
+        _thread_local.mm_buffers = buffers
+    out, mask = buffers
+    np.multiply(rate, np.float32(3600.0), out=out, casting="unsafe")
+    np.isnan(out, out=mask)
+    np.copyto(out, np.float32(_NODATA), where=mask)
+    return out
+
+
+def _raster_profile(height: int, width: int, transform: Affine, count: int = 1) -> dict:
+    """Creation options shared by every GFS GeoTIFF: tiled, DEFLATE + floating point predictor."""
+    return dict(
+        driver="GTiff",
+        width=width,
+        height=height,
+        count=count,
+        dtype="float32",
+        crs=_WGS84,
+        transform=transform,
+        nodata=_NODATA,
+        tiled=True,
+        blockxsize=256,
+        blockysize=256,
+        compress="deflate",
+        predictor=3,
+        BIGTIFF="IF_NEEDED",
+        num_threads="ALL_CPUS",
+        # one band per forecast hour is read on its own, so keep each band contiguous
+        interleave="band" if count > 1 else "pixel",
+    )
+
+
+def _build_overviews(dst, height: int, width: int) -> None:
+    """Internal overviews, only the levels that still leave at least one pixel per side."""
+    factors = [f for f in _OVERVIEW_FACTORS if min(height, width) // f >= 1]
+    if factors:
+        dst.build_overviews(factors, Resampling.average)
+        dst.update_tags(ns="rio_overview", resampling="average")
+
+
+def _safe_to_raster(data: np.ndarray, lat: np.ndarray, lon: np.ndarray, out_path: str) -> None:
+    """Write a (lat, lon) grid to GeoTIFF with sensible defaults for EF5 compatibility.
+
+    Writes straight through rasterio, without building an xarray/rioxarray object per file, as a
+    tiled, DEFLATE + floating point predictor GeoTIFF with internal overviews (COG-friendly layout).
+    """
     # Ensure directory exists
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    # Fill NaNs
-    data = da.data.astype(np.float32)
-    data = np.where(np.isnan(data), -9999.0, data)
-    # rioxarray respects dtype/nodata via kwargs
-    da_to_write = xr.DataArray(
-        data=data,
-        dims=da.dims,
-        coords=da.coords,
-        name=da.name or "PRATE_mm_hr",
-        attrs={"units": "mm/h"},
-    )
-    da_to_write.rio.write_nodata(-9999.0, inplace=True)
-    da_to_write.rio.to_raster(out_path, driver="GTiff", dtype="float32")
+    # NaNs were already replaced by nodata in _mm_per_hour
+    data = np.asarray(data, dtype=np.float32)
+    height, width = data.shape
+    with rasterio.open(out_path, "w", **_raster_profile(height, width, _grid_transform(lat, lon))) as dst:
+        dst.write(data, 1)
+        _build_overviews(dst, height, width)
+
+
+class _MultiBandWriter:
+    """Write forecast hours as the bands of one GeoTIFF, in whatever order the workers finish.
+
+    Every hour shares the bbox clip, so the file is created from the first grid to arrive. Band i
+    holds the i-th forecast hour and is described by its valid time (ISO 8601); bands of hours
+    that never arrive are filled with nodata on close.
+    """
+
+    def __init__(self, out_path: str, init_time: datetime, fxx_list: List[int]):
+        self.out_path = out_path
+        self._init_time = init_time
+        self._bands = {fxx: i + 1 for i, fxx in enumerate(fxx_list)}
+        self._written = set()
+        self._lock = threading.Lock()
+        self._dst = None
+
+    def write(self, fxx: int, data: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> None:
+        data = np.asarray(data, dtype=np.float32)
+        with self._lock:
+            if self._dst is None:
+                os.makedirs(os.path.dirname(self.out_path), exist_ok=True)
+                height, width = data.shape
+                self._dst = rasterio.open(
+                    self.out_path,
+                    "w",
+                    **_raster_profile(height, width, _grid_transform(lat, lon), count=len(self._bands)),
+                )
+                for band_fxx, band in self._bands.items():
+                    valid_time = self._init_time + timedelta(hours=band_fxx)
+                    self._dst.set_band_description(band, valid_time.isoformat())
+            self._dst.write(data, self._bands[fxx])
+            self._written.add(fxx)
+
+    def close(self) -> bool:
+        """Fill missing hours with nodata, build the overviews and close the file.
+
+        Returns False if no band was ever written (no file is created then).
+        """
+        if self._dst is None:
+            return False
+        try:
+            missing = [band for fxx, band in self._bands.items() if fxx not in self._written]
+            if missing:
+                fill = np.full((self._dst.height, self._dst.width), _NODATA, dtype=np.float32)
+                for band in missing:
+                    self._dst.write(fill, band)
+            _build_overviews(self._dst, self._dst.height, self._dst.width)
+        finally:
+            self._dst.close()
+        return True
+
+
+def _cache_path(
+    qpf_store_path: str, init_time: datetime, fxx: int, xmin: float, ymin: float, xmax: float, ymax: float
+) -> str:
+    """Path of the cached clipped grid of a cycle, forecast hour and bbox.
+
+    Named <cycle YYYYMMDDHHMM>.<hash>.npz, so `_prune_cache` can tell the cycle from the name.
+    """
+    key = hashlib.blake2b(
+        f"{init_time.isoformat()}|{fxx}|{xmin},{ymin},{xmax},{ymax}".encode(), digest_size=16
+    ).hexdigest()
+    return os.path.join(qpf_store_path, ".cache", f"{init_time:%Y%m%d%H%M}.{key}.npz")
+
+
+def _prune_cache(qpf_store_path: str, init_time: datetime, cache_ttl_hours: Optional[float]) -> None:
+    """Delete cached grids of cycles before `init_time`, and any cache file older than the TTL."""
+    cycle = f"{init_time:%Y%m%d%H%M}"
+    cutoff = None if cache_ttl_hours is None else time.time() - cache_ttl_hours * 3600.0
+    try:
+        entries = os.scandir(os.path.join(qpf_store_path, ".cache"))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            stamp = entry.name.split(".", 1)[0]
+            try:
+                if not stamp.isdigit() or stamp < cycle or (
+                    cutoff is not None and entry.stat().st_mtime < cutoff
+                ):
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def _load_cached_grid(
+    cache_path: str, cache_ttl_hours: Optional[float] = None
+) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Return the cached (data, lat, lon) grid, or None when missing, stale or unreadable."""
+    try:
+        if cache_ttl_hours is not None:
+            age_hours = (time.time() - os.path.getmtime(cache_path)) / 3600.0
+            if age_hours > cache_ttl_hours:
+                return None
+        with np.load(cache_path) as cached:
+            return cached["data"], cached["lat"], cached["lon"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save_cached_grid(cache_path: str, data: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> None:
+    """Store a clipped grid for later runs. Written to a temporary name and renamed, so
+    concurrent workers and readers never see a partial file. Failures only cost the cache."""
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.savez(f, data=data, lat=lat, lon=lon)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        sys.stderr.write(f"Warning: could not cache {cache_path}. Reason: {e}\n")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _http_session() -> requests.Session:
+    """Return the calling thread's pooled HTTP session, creating it on first use."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.3),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _thread_local.session = session
+    return session
+
+
+class _PooledRequests:
+    """Stand-in for the `requests` module inside herbie.core.
+
+    Herbie calls `requests.get`/`requests.head` directly, opening a new connection for
+    every source probe (HEAD) and .idx fetch (GET). Routing those two calls through
+    `_http_session` keeps one connection pool per thread; everything else falls through
+    to `requests`. The GRIB byte ranges themselves are downloaded by Herbie with curl and
+    are not affected.
+    """
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    @staticmethod
+    def get(url, **kwargs):
+        return _http_session().get(url, **kwargs)
+
+    @staticmethod
+    def head(url, **kwargs):
+        return _http_session().head(url, **kwargs)
+
+
+# Number of download_GFS calls currently running with herbie.core pointed at _PooledRequests
+_herbie_pool_lock = threading.Lock()
+_herbie_pool_users = 0
+
+
+@contextmanager
+def _pooled_herbie_requests():
+    """Point herbie.core at `_PooledRequests` for the duration of a download.
+
+    Reference-counted, so overlapping download_GFS calls restore the real `requests` module only
+    when the last one finishes; Herbie users elsewhere in the process are untouched otherwise.
+    A no-op if Herbie's layout differs.
+    """
+    global _herbie_pool_users
+    try:
+        import herbie.core as herbie_core
+    except ImportError:  # pragma: no cover
+        herbie_core = None
+    if herbie_core is None:
+        yield
+        return
+
+    with _herbie_pool_lock:
+        if _herbie_pool_users == 0 and getattr(herbie_core, "requests", None) is requests:
+            herbie_core.requests = _PooledRequests()
+        _herbie_pool_users += 1
+    try:
+        yield
+    finally:
+        with _herbie_pool_lock:
+            _herbie_pool_users -= 1
+            if _herbie_pool_users == 0 and isinstance(getattr(herbie_core, "requests", None), _PooledRequests):
+                herbie_core.requests = requests
+
+
+def _fetch_grid(
+    init_time: datetime,
+    fxx: int,
+    xmin: float,
+    xmax: float,
+    ymin: float,
+    ymax: float,
+    qpf_store_path: str,
+    cache_ttl_hours: Optional[float] = None,
+) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Fetch PRATE for one forecast hour, clip it and convert it to mm/hour.
+
+    A clipped grid cached by an earlier run is returned directly, skipping Herbie.
+    Returns (data, lat, lon), or None when the forecast hour is unavailable.
+    """
+    valid_time = init_time + timedelta(hours=fxx)
+
+    # Reuse the clipped grid of an earlier run of the same cycle, hour and bbox
+    cache_path = _cache_path(qpf_store_path, init_time, fxx, xmin, ymin, xmax, ymax)
+    cached = _load_cached_grid(cache_path, cache_ttl_hours)
+    if cached is not None:
+        return cached
+
+    # retrieve PRATE via Herbie for this forecast hour
+    H = Herbie(init_time, model="gfs", product="pgrb2.0p25", fxx=fxx)
+
+    # Try the query that last worked first; the others only if it fails for this hour
+    global _winning_query
+    winner = _winning_query
+    queries = _PRATE_QUERIES if winner is None else (winner,) + tuple(q for q in _PRATE_QUERIES if q != winner)
+
+    ds: Optional[Union[xr.Dataset, List[xr.Dataset]]] = None
+    last_err: Optional[Exception] = None
+    for query in queries:
+        try:
+            ds = H.xarray(query)
+            _winning_query = query
+            break
+        except Exception as e:  # pragma: no cover - remote data nuances
+            last_err = e
+            ds = None
+    if ds is None:
+        # If PRATE is missing for this hour, we skip
+        sys.stderr.write(
+            f"Warning: Could not retrieve PRATE for f{fxx:03d} ({valid_time:%Y-%m-%d %H:%M} UTC).\n"
+        )
+        if last_err:
+            sys.stderr.write(f"  Reason: {last_err}\n")
+        return None
+
+    # Herbie/cfgrib may return a list of datasets (multiple hypercubes).
+    # Per user request, use the first hypercube (cube 0).
+    try:
+        if isinstance(ds, list):
+            if len(ds) == 0:
+                raise KeyError("Empty hypercube list returned for PRATE")
+            ds0 = ds[0]
+            ds = ds0
+            if "prate" in ds.data_vars:
+                var_name = "prate"
+            elif "PRATE" in ds.data_vars:
+                var_name = "PRATE"
+            else:
+                # Fall back: try to find a single data var
+                data_vars = list(ds.data_vars)
+                if not data_vars:
+                    raise KeyError("PRATE variable not present in first hypercube")
+                var_name = data_vars[0]
+        else:
+            if "prate" in ds.data_vars:
+                var_name = "prate"
+            elif "PRATE" in ds.data_vars:
+                var_name = "PRATE"
+            else:
+                raise KeyError("PRATE variable not present in dataset")
+
+        prate_da = ds[var_name]
+    except Exception as e:  # pragma: no cover
+        sys.stderr.write(
+            f"Warning: PRATE variable not found for f{fxx:03d}. Reason: {e}\n"
+        )
+        return None
+
+    # Standardize spatial dims and CRS
+    prate_da = _standardize_latlon(prate_da)
+    prate_da = _wrap_longitudes_to_180(prate_da)
+
+    # Clip to bounding box by index first, so only the window is scaled and written.
+    # If the bbox leaves less than two cells on an axis (e.g. outside the domain), write un-clipped
+    lat_vals = prate_da["lat"].values
+    lon_vals = prate_da["lon"].values
+    rows = _bbox_slice(lat_vals, float(ymin), float(ymax))
+    cols = _bbox_slice(lon_vals, float(xmin), float(xmax))
+    if rows is None or cols is None:
+        rows, cols = slice(None), slice(None)
+    clipped_da = prate_da.isel(lat=rows, lon=cols)
+
+    # Convert rate (kg m-2 s-1 == mm/s) to mm/hour, with NaNs already set to nodata
+    rate = clipped_da.data
+    if rate.ndim == 3:
+        rate = np.squeeze(rate, axis=0)
+    rate_mm_per_hour = _mm_per_hour(rate)
+
+    # Cache the clipped grid for later runs
+    grid = (rate_mm_per_hour, lat_vals[rows], lon_vals[cols])
+    _save_cached_grid(cache_path, *grid)
+    return grid
+
+
+def _fetch_and_write(
+    init_time: datetime,
+    fxx: int,
+    xmin: float,
+    xmax: float,
+    ymin: float,
+    ymax: float,
+    qpf_store_path: str,
+    cache_ttl_hours: Optional[float] = None,
+    writer: Optional[_MultiBandWriter] = None,
+) -> Optional[str]:
+    """Fetch one forecast hour and write it as gfs.YYYYMMDDHHMM.tif (valid time), or as its band of `writer`.
+
+    Returns the written path, or None when the forecast hour is unavailable.
+    """
+    grid = _fetch_grid(init_time, fxx, xmin, xmax, ymin, ymax, qpf_store_path, cache_ttl_hours)
+    if grid is None:
+        return None
+    if writer is not None:
+        writer.write(fxx, *grid)
+        return writer.out_path
+    valid_time = init_time + timedelta(hours=fxx)
+    out_path = os.path.join(qpf_store_path, f"gfs.{valid_time:%Y%m%d%H%M}.tif")
+    _safe_to_raster(*grid, out_path)
+    return out_path
 
 
 def download_GFS(
@@ -220,6 +668,9 @@ def download_GFS(
     ymin: float,
     ymax: float,
     qpf_store_path: str,
+    max_workers: int = 8,
+    cache_ttl_hours: Optional[float] = _CACHE_TTL_HOURS,
+    single_file: bool = False,
 ) -> List[str]:
     """Download GFS PRATE with Herbie and write hourly rate GeoTIFFs clipped to bbox.
 
@@ -231,6 +682,11 @@ def download_GFS(
         ymin: Minimum latitude for clipping.
         ymax: Maximum latitude for clipping.
         qpf_store_path: Output directory to store GeoTIFFs.
+        max_workers: Number of forecast hours fetched concurrently.
+        cache_ttl_hours: Age after which cached clipped grids are refetched and deleted (None keeps
+            them until a later cycle is downloaded). Grids of earlier cycles are always deleted.
+        single_file: Write one gfs.YYYYMMDDHHMM.bands.tif (init time) with a band per forecast
+            hour, described by its valid time, instead of one GeoTIFF per hour.
 
     Returns:
         List of output GeoTIFF file paths written.
@@ -246,103 +702,38 @@ def download_GFS(
     # Skip analysis hour (f000) for rate-based data
     fxx_list = fxx_all
 
-    outputs: List[str] = []
-
-    for fxx in fxx_list:
-        valid_time = init_time + timedelta(hours=fxx)
+    os.makedirs(qpf_store_path, exist_ok=True)
+    _prune_cache(qpf_store_path, init_time, cache_ttl_hours)
 
-        # retrieve PRATE via Herbie for this forecast hour
-        H = Herbie(init_time, model="gfs", product="pgrb2.0p25", fxx=fxx)
-
-        ds: Optional[Union[xr.Dataset, List[xr.Dataset]]] = None
-        last_err: Optional[Exception] = None
-        for query in (":PRATE:surface", ":PRATE:", "PRATE:surface", "PRATE"):
-            try:
-                ds = H.xarray(query)
-                break
-            except Exception as e:  # pragma: no cover - remote data nuances
-                last_err = e
-                ds = None
-        if ds is None:
-            # If PRATE is missing for this hour, we skip
-            sys.stderr.write(
-                f"Warning: Could not retrieve PRATE for f{fxx:03d} ({valid_time:%Y-%m-%d %H:%M} UTC).\n"
-            )
-            if last_err:
-                sys.stderr.write(f"  Reason: {last_err}\n")
-            continue
-
-        # Herbie/cfgrib may return a list of datasets (multiple hypercubes).
-        # Per user request, use the first hypercube (cube 0).
-        try:
-            if isinstance(ds, list):
-                if len(ds) == 0:
-                    raise KeyError("Empty hypercube list returned for PRATE")
-                ds0 = ds[0]
-                ds = ds0
-                if "prate" in ds.data_vars:
-                    var_name = "prate"
-                elif "PRATE" in ds.data_vars:
-                    var_name = "PRATE"
-                else:
-                    # Fall back: try to find a single data var
-                    data_vars = list(ds.data_vars)
-                    if not data_vars:
-                        raise KeyError("PRATE variable not present in first hypercube")
-                    var_name = data_vars[0]
-            else:
-                if "prate" in ds.data_vars:
-                    var_name = "prate"
-                elif "PRATE" in ds.data_vars:
-                    var_name = "PRATE"
-                else:
-                    raise KeyError("PRATE variable not present in dataset")
-
-            prate_da = ds[var_name]
-        except Exception as e:  # pragma: no cover
-            sys.stderr.write(
-                f"Warning: PRATE variable not found for f{fxx:03d}. Reason: {e}\n"
-            )
-            continue
-
-        # Standardize spatial dims and CRS
-        prate_da = _standardize_latlon(prate_da)
-        prate_da = _wrap_longitudes_to_180(prate_da)
-
-        # Convert rate (kg m-2 s-1 == mm/s) to mm/hour
-        rate = prate_da.data.astype(np.float32)
-        if rate.ndim == 3:
-            rate = np.squeeze(rate, axis=0)
-        # Convert mm/s to mm/hour (multiply by 3600)
-        rate_mm_per_hour = rate * 3600.0
-
-        # Build DataArray with mm/hour precipitation rate
-        step_da = xr.DataArray(
-            data=rate_mm_per_hour,
-            dims=("lat", "lon"),
-            coords={"lat": prate_da.coords["lat"], "lon": prate_da.coords["lon"]},
-            name="PRATE_mm_per_hour",
-            attrs={"units": "mm/hour"},
+    writer = None
+    if single_file:
+        writer = _MultiBandWriter(
+            os.path.join(qpf_store_path, f"gfs.{init_time:%Y%m%d%H%M}.bands.tif"), init_time, fxx_list
         )
 
-        # Attach spatial metadata for rioxarray
-        step_da = step_da.rio.write_crs("EPSG:4326", inplace=False)
-        step_da = step_da.rio.set_spatial_dims(x_dim="lon", y_dim="lat", inplace=False)
-
-        # Clip to bounding box
-        try:
-            clipped_da = step_da.rio.clip_box(minx=float(xmin), miny=float(ymin), maxx=float(xmax), maxy=float(ymax))
-        except Exception:
-            # If clip fails (e.g., bbox outside domain), fall back to un-clipped writing
-            clipped_da = step_da
-
-        # Build output path and write
-        out_name = f"gfs.{valid_time:%Y%m%d%H%M}.tif"
-        out_path = os.path.join(qpf_store_path, out_name)
-        os.makedirs(qpf_store_path, exist_ok=True)
-        _safe_to_raster(clipped_da, out_path)
-        outputs.append(out_path)
-
+    # Forecast hours are independent and network-bound, so their fetches overlap in a thread pool
+    outputs: List[str] = []
+    try:
+        with _pooled_herbie_requests(), ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(fxx_list)))) as ex:
+            futures = [
+                ex.submit(
+                    _fetch_and_write, init_time, fxx, xmin, xmax, ymin, ymax, qpf_store_path, cache_ttl_hours, writer
+                )
+                for fxx in fxx_list
+            ]
+            for future in as_completed(futures):
+                out_path = future.result()
+                if out_path is not None:
+                    outputs.append(out_path)
+    finally:
+        if writer is not None and not writer.close():
+            outputs = []
+
+    if writer is not None:
+        return [writer.out_path] if outputs else []
+
+    # File names encode the valid time, so sorting restores the forecast order
+    outputs.sort()
     return outputs
 
 
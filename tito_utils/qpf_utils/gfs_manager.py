@@ -1,8 +1,10 @@
 import os
-import shutil
+import pandas as pd
 from datetime import datetime as dt
 from datetime import timedelta
 from .gfs_downloader import download_GFS
+from tito_utils.file_utils.file_handling import iter_tifs, link_or_copy
+from tito_utils.file_utils.fast_copy import batch_copy
 import glob
 
 def GFS_searcher(path_gfs, qpf_store_path, start_time, end_time, xmin, xmax, ymin, ymax):
@@ -33,29 +35,24 @@ def GFS_searcher(path_gfs, qpf_store_path, start_time, end_time, xmin, xmax, ymi
     for f in glob.glob(os.path.join(download_folder, "*.tif")):
                 os.remove(f)
 
-    # Build list of expected times (hourly steps assumed)
-    expected_times = []
-    current = start_time
-    
-    while current <= end_time:
-        expected_times.append(current)
-        current += timedelta(hours=1)
-
-    # Build expected file names
+    # Build list of expected times (hourly steps assumed) and their file names
+    expected_times = pd.date_range(start_time, end_time, freq="1h")
     expected_files = [
-        os.path.join(path_gfs, f"gfs.{t:%Y%m%d%H%M}.tif") for t in expected_times
+        os.path.join(path_gfs, name) for name in expected_times.strftime("gfs.%Y%m%d%H%M.tif")
     ]
     
-    missing_files = [f for f in expected_files if not os.path.exists(f)]
+    # List the archive once and check the expected names against it in memory
+    try:
+        present = {entry.name for entry in iter_tifs(path_gfs)}
+    except FileNotFoundError:
+        present = set()
+    missing_files = [f for f in expected_files if os.path.basename(f) not in present]
     if not missing_files:
         print("All files available. Copying to destination...")
-        #copy files
-        for f in expected_files:
-            dest = os.path.join(download_folder, os.path.basename(f))
-            try:
-                shutil.copy2(f, dest)
-            except Exception as e:
-                print(f"Failed to copy {f}: {e}")
+        #hardlink files, copying only across filesystems, with the files handled concurrently
+        copies = [(f, os.path.join(download_folder, os.path.basename(f))) for f in expected_files]
+        for f, dest, e in batch_copy(copies, copy_function=link_or_copy, max_workers=16):
+            print(f"Failed to copy {f}: {e}")
         print("Copy completed.")
     else:
         print(f"⚠️ Missing {len(missing_files)} files. Triggering download...")
@@ -1,15 +1,18 @@
 import os
-import glob
-import shutil
-import datetime
-from datetime import datetime
 from datetime import timedelta
 import subprocess
+from tito_utils.file_utils.dir_cache import DirSnapshot
+from tito_utils.file_utils.file_handling import link_or_copy
 
 from servir_nowcasting_examples.m_nowcasting import load_default_params_for_model, nowcast
 from servir_data_utils.m_h5py2tif import h5py2tif
 from servir_data_utils.m_tif2h5py import tif2h5py
 
+# Window of the fallback nowcast around the current time, in half-hour steps
+_TD_30M = timedelta(minutes=30)
+_TD_2H30 = timedelta(hours=2.5)
+_TD_3H30 = timedelta(hours=3.5)
+
 def run_convlstm(currentTime, precipFolder, nowcast_model_name, xmin, ymin, xmax, ymax):
     #running nowcast codes
     try:
@@ -33,38 +36,33 @@ def run_convlstm(currentTime, precipFolder, nowcast_model_name, xmin, ymin, xmax
         print(e)
         
         #Produce ML qpf from currentTime - 4h till currentime +2h
-        init = currentTime - timedelta(hours = 3.5)
-        final = currentTime + timedelta(hours = 2.5)
+        init = currentTime - _TD_3H30
+        final = currentTime + _TD_2H30
         print('    Duplicating last qpe file')
         date_list = []
         current_date = init
         while current_date <= final:
             date_list.append(current_date.strftime('%Y%m%d%H%M'))
-            current_date += timedelta(minutes=30)
+            current_date += _TD_30M
             
-        # Find all .tif files in the directory
-        tif_files = glob.glob(os.path.join(precipFolder, "imerg.qpe.*.30minAccum.tif"))
-    
-        # Extract dates from filenames and find the most recent file
+        # Find the most recent qpe in a single pass over the folder
         most_recent_file = None
-        most_recent_date = None
-
-        for file in tif_files:
-            filename = os.path.basename(file)
-            file_date_str = filename.split('.')[2]
-            file_date = datetime.strptime(file_date_str, '%Y%m%d%H%M')
-            if most_recent_date is None or file_date > most_recent_date:
-                most_recent_date = file_date
-                most_recent_file = file
+        qpe_files = DirSnapshot(precipFolder).match("imerg.qpe.*.30minAccum.tif")
+        if qpe_files:
+            # Names only differ by their fixed width stamp, so the latest name is the latest file
+            most_recent_name = max(qpe_files)
+            most_recent_file = os.path.join(precipFolder, most_recent_name)
 
         if most_recent_file is None:
             print("     No valid .tif files found in the directory.")
         else:
             print(f"     Most recent file selected: {most_recent_file}")
 
-        # Duplicate the most recent file with new names based on the date list
-        for date_str in date_list:
-            new_filename = f"imerg.qpe.{date_str}.30minAccum.tif"
-            new_filepath = os.path.join(precipFolder, new_filename)
-            shutil.copy2(most_recent_file, new_filepath)
-            print(f"Created file: {new_filepath}")    
+            # Duplicate the most recent file with new names based on the date list, as hardlinks
+            for date_str in date_list:
+                new_filename = f"imerg.qpe.{date_str}.30minAccum.tif"
+                new_filepath = os.path.join(precipFolder, new_filename)
+                if new_filepath == most_recent_file:
+                    continue
+                link_or_copy(most_recent_file, new_filepath)
+                print(f"Created file: {new_filepath}")